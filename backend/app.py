@@ -1,77 +1,110 @@
 from flask import Flask, request, jsonify, send_file
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
 from werkzeug.utils import secure_filename
 import os
+import io
+import shutil
+import re
+import hashlib
+import threading
+import uuid
+import time
 from datetime import datetime
 import json
+import orjson
 import logging
 from dotenv import load_dotenv
-from utils.ai_data_cleaner import ai_clean_dataset, analyze_dataframe, get_ai_cleaning_recommendations, create_default_recommendations, apply_ai_recommendations
-from langchain.agents import initialize_agent, AgentType
-from langchain.chains import LLMChain
+from utils.ai_data_cleaner import analyze_dataframe, cached_column_stats, missing_value_counts, request_ai_cleaning_recommendations, create_default_recommendations, apply_ai_recommendations
 from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
 from langchain.tools import Tool
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
 from typing import Dict, List, Any, Optional
+from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from langgraph.prebuilt import create_react_agent
+from langchain.globals import set_llm_cache
+from langchain_community.cache import SQLiteCache
 
-# Custom JSON encoder to handle NumPy types and other non-serializable objects
-class NumpyEncoder(json.JSONEncoder):
-    def default(self, obj):
-        # Handle NumPy data types
-        if isinstance(obj, np.integer):
-            return int(obj)
-        if isinstance(obj, np.floating):
-            return float(obj)
-        if isinstance(obj, np.bool_):
-            return bool(obj)
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        
-        # Handle pandas data types
-        if isinstance(obj, pd.Series):
-            return obj.tolist()
-        if isinstance(obj, pd.DataFrame):
-            return obj.to_dict(orient='records')
-        if isinstance(obj, pd.Timestamp):
-            return obj.isoformat()
-        
-        # Handle sets and other iterables
-        if isinstance(obj, set):
-            return list(obj)
-        
-        # Handle objects with a to_dict method (like Pydantic models)
-        if hasattr(obj, 'to_dict') and callable(getattr(obj, 'to_dict')):
-            return obj.to_dict()
-            
-        # Handle objects with a dict method (like Pydantic models)
-        if hasattr(obj, 'dict') and callable(getattr(obj, 'dict')):
-            return obj.dict()
-            
-        # Let the base class default method raise the TypeError
-        return super(NumpyEncoder, self).default(obj)
+# Fallback conversions for values orjson cannot serialize natively
+def _json_default(obj):
+    # Handle NumPy values orjson rejects (object arrays, non-contiguous arrays)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    
+    # Handle pandas data types
+    if obj is pd.NaT:
+        return None
+    if isinstance(obj, pd.Series):
+        return obj.tolist()
+    if isinstance(obj, pd.DataFrame):
+        return obj.to_dict(orient='records')
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    
+    # Handle sets and other iterables
+    if isinstance(obj, set):
+        return list(obj)
+    
+    # Handle Pydantic v2 models without going through the deprecated .dict()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    
+    # Handle objects with a to_dict method
+    if hasattr(obj, 'to_dict') and callable(getattr(obj, 'to_dict')):
+        return obj.to_dict()
+        
+    # Handle objects with a dict method (like Pydantic models)
+    if hasattr(obj, 'dict') and callable(getattr(obj, 'dict')):
+        return obj.dict()
+        
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, which encodes NumPy scalars and arrays in C"""
+    mimetype = 'application/json'
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_json_default, option=ORJSON_OPTIONS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_json_default, option=ORJSON_OPTIONS),
+            mimetype=self.mimetype
+        )
 
 # Load environment variables
 load_dotenv()
 
+# Debug mode (reloader, debugger, verbose logging) only for local development
+DEBUG = os.getenv('FLASK_ENV') == 'development'
+
 # Configure logging
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=logging.DEBUG if DEBUG else logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
 app = Flask(__name__)
-# Configure Flask to use the custom JSON encoder
-app.json_encoder = NumpyEncoder
+# Serialize responses with orjson; it handles the NumPy values in reports natively
+app.json = OrjsonProvider(app)
 
-# More permissive CORS configuration for debugging
+# CORS for the single frontend origin; browsers cache the preflight for max_age seconds
 CORS(app, resources={
     r"/*": {
-        "origins": ["http://localhost:3000"],
-        "methods": ["GET", "POST", "OPTIONS"],
+        "origins": os.getenv('FRONTEND_ORIGIN', 'http://localhost:3000'),
+        "methods": ("GET", "POST", "OPTIONS"),
         "allow_headers": ["Content-Type", "Authorization", "X-Requested-With"],
         "expose_headers": ["Content-Disposition"],
         "supports_credentials": True,
@@ -83,18 +116,275 @@ CORS(app, resources={
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'csv', 'xlsx'}
 MAX_FILE_SIZE = 32 * 1024 * 1024  # 32MB
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', '.llm_cache.db')
+PARSED_SUFFIX = '.parsed.pkl'  # Sibling file holding the parsed DataFrame of an upload
+UPLOAD_META_SUFFIX = '.meta.json'  # Sibling file holding the /upload response of a file
+ANALYSIS_SUFFIX = '.analysis.json'  # State of a background AI analysis job
+ANALYSIS_JOB_ID = re.compile(r'[0-9a-f]{32}')
+ANALYSIS_JOB_TTL = 60 * 60  # Seconds a finished or abandoned job's state is kept for polling
+ANALYSIS_JOB_TIMEOUT = 15 * 60  # Seconds after which a job still pending is reported as failed
+NUMERIC_COLS_ATTR = 'numeric_columns'  # df.attrs keys set by _load_df
+OBJECT_COLS_ATTR = 'object_columns'
+COLUMN_LAYOUT_ATTR = 'column_layout'  # Columns and dtypes the groups above were resolved for
+
+# OpenAI API key, read once at startup and replaced by /set-api-key
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-key')
+# Let a fronting web server (Apache mod_xsendfile, lighttpd) stream downloads
+# instead of the worker; only enable behind a server that honours X-Sendfile
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
 app.config['TIMEOUT'] = 120  # 2 minutes
 
-# Create uploads directory if it doesn't exist
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Cache LLM responses on disk so identical prompts (the same dataset analysed
+# again on /upload and /clean, or re-uploaded) skip the OpenAI round-trip.
+# Prompts embed the dataset statistics and tool results, so entries are
+# effectively keyed on the file contents.
+set_llm_cache(SQLiteCache(database_path=LLM_CACHE_PATH))
+
+# Create uploads directory once at startup; handlers rely on it existing
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+# Dataset readers by file extension; calamine (Rust) parses xlsx several times
+# faster than the default openpyxl engine
+_READERS = {
+    '.csv': pd.read_csv,
+    '.xlsx': lambda path: pd.read_excel(path, engine='calamine'),
+}
+# Writers for cleaned datasets; xlsxwriter builds workbooks considerably faster
+# than openpyxl
+_WRITERS = {
+    '.csv': lambda df, path: df.to_csv(path, index=False),
+    '.xlsx': lambda df, path: df.to_excel(path, index=False, engine='xlsxwriter'),
+}
+_ALLOWED_SUFFIXES = tuple('.' + ext for ext in ALLOWED_EXTENSIONS)
+
+def _ext(path):
+    return os.path.splitext(path)[1].lower()
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return filename.lower().endswith(_ALLOWED_SUFFIXES)
+
+def openai_key_configured():
+    return bool(OPENAI_API_KEY) and OPENAI_API_KEY != "empty-string"
+
+def openai_key_fingerprint() -> Optional[str]:
+    """Short hash identifying the configured OpenAI key, or None when AI is disabled"""
+    if not openai_key_configured():
+        return None
+    return hashlib.blake2b(OPENAI_API_KEY.encode(), digest_size=8).hexdigest()
+
+def _parse_df(df_path: str, mtime: float) -> pd.DataFrame:
+    """Parse a dataset file, preferring the persisted frame of an earlier parse"""
+    # Reuse the frame persisted by an earlier parse (possibly in another worker)
+    parsed_path = df_path + PARSED_SUFFIX
+    if os.path.exists(parsed_path) and os.path.getmtime(parsed_path) >= mtime:
+        try:
+            return pd.read_pickle(parsed_path)
+        except Exception as e:
+            # A damaged or incompatible pickle; parse the source again and replace it
+            app.logger.warning(f"Could not read parsed frame for {df_path}, parsing it again: {str(e)}")
+    
+    df = _READERS[_ext(df_path)](df_path)
+    
+    # Resolve the column groups the report tools select on once per parse
+    df.attrs[NUMERIC_COLS_ATTR] = tuple(df.select_dtypes(include=[np.number]).columns)
+    df.attrs[OBJECT_COLS_ATTR] = tuple(df.select_dtypes(include=['object']).columns)
+    df.attrs[COLUMN_LAYOUT_ATTR] = _column_layout(df)
+    
+    # Persist the parsed frame next to the upload; reading it back skips type
+    # inference and the xlsx XML parse entirely. Written under a private name and
+    # moved into place, so a concurrent or failed write never leaves a truncated file.
+    tmp_path = f"{parsed_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, parsed_path)
+    except Exception as e:
+        app.logger.warning(f"Could not persist parsed frame for {df_path}: {str(e)}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return df
+
+# Parsed DataFrames keyed by (path, mtime), least recently used first, bounded
+# both by entry count and by the total in-memory size of the cached frames
+DF_CACHE_MAX_ENTRIES = 8
+DF_CACHE_MAX_BYTES = 256 * 1024 * 1024
+_df_cache = OrderedDict()  # (path, mtime) -> (DataFrame, nbytes)
+_df_cache_lock = threading.Lock()
+
+def _load_df(df_path: str, mtime: float) -> pd.DataFrame:
+    """
+    Parse a dataset file, memoized on (path, modification time)
+    Args:
+        df_path: Path to the dataset file
+        mtime: Modification time of the file, part of the cache key so a
+            rewritten file is parsed again
+    Returns:
+        Parsed DataFrame. The instance is shared between callers and must not
+        be mutated in place.
+    """
+    key = (df_path, mtime)
+    with _df_cache_lock:
+        if key in _df_cache:
+            _df_cache.move_to_end(key)
+            return _df_cache[key][0]
+    
+    df = _parse_df(df_path, mtime)
+    nbytes = int(df.memory_usage(index=True, deep=True).sum())
+    app.logger.debug("Loaded %s: %.1fMB in memory", df_path, nbytes / (1024 * 1024))
+    
+    with _df_cache_lock:
+        _df_cache[key] = (df, nbytes)
+        _df_cache.move_to_end(key)
+        # Evict least recently used frames, always keeping the one just loaded
+        total = sum(size for _, size in _df_cache.values())
+        while len(_df_cache) > 1 and (len(_df_cache) > DF_CACHE_MAX_ENTRIES or total > DF_CACHE_MAX_BYTES):
+            _, (_, size) = _df_cache.popitem(last=False)
+            total -= size
+    return df
+
+def clear_dataframe_cache():
+    with _df_cache_lock:
+        _df_cache.clear()
+
+def _column_layout(df: pd.DataFrame):
+    return (tuple(df.columns), tuple(str(dtype) for dtype in df.dtypes))
+
+def _column_group(df: pd.DataFrame, attr: str, include) -> List[str]:
+    """Columns of the given dtypes, taken from df.attrs when _load_df recorded them"""
+    # pandas copies attrs onto derived frames (column subsets, cleaned copies), so the
+    # recorded groups are only used while the columns and dtypes are still the parsed ones
+    if attr in df.attrs and df.attrs.get(COLUMN_LAYOUT_ATTR) == _column_layout(df):
+        return list(df.attrs[attr])
+    return df.select_dtypes(include=include).columns.tolist()
+
+def load_dataframe(df_path: str) -> pd.DataFrame:
+    """Load a dataset file, reusing the parsed DataFrame if the file is unchanged"""
+    return _load_df(df_path, os.path.getmtime(df_path))
+
+@lru_cache(maxsize=64)
+def _file_digest(df_path: str, mtime: float) -> str:
+    """Content hash of a dataset file, memoized on (path, modification time)"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(df_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_digest(df_path: str) -> str:
+    return _file_digest(df_path, os.path.getmtime(df_path))
+
+# AI helper results keyed by (file content hash, helper name), so re-uploading a
+# file or cleaning it again reuses them. Cleared when the API key changes.
+AI_RESULTS_MAX = 32
+_ai_results = {}  # key -> Future of the helper's result
+_ai_results_lock = threading.Lock()
+
+# Background AI analysis of uploads (agent run and recommendations), polled through
+# /analysis/<job_id> so the upload response doesn't wait on the OpenAI round-trips
+_analysis_pool = ThreadPoolExecutor(max_workers=4)
+
+def memoized_on_file(digest: str, func, *args, **kwargs):
+    """
+    Return func(*args, **kwargs), computed once per file content
+    Args:
+        digest: Content hash of the file the arguments were derived from
+        func: AI helper to call
+    Returns:
+        The (shared) result of the helper; callers must not mutate it.
+        Exceptions are raised to every concurrent caller but not cached, so the
+        next call retries.
+    """
+    key = (digest, func.__name__)
+    with _ai_results_lock:
+        future = _ai_results.get(key)
+        owner = future is None
+        if owner:
+            if len(_ai_results) >= AI_RESULTS_MAX:
+                # Evict the oldest entry
+                _ai_results.pop(next(iter(_ai_results)), None)
+            # Concurrent callers for the same file wait on this call instead of repeating it
+            future = _ai_results[key] = Future()
+    
+    if owner:
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as e:
+            with _ai_results_lock:
+                if _ai_results.get(key) is future:
+                    del _ai_results[key]
+            future.set_exception(e)
+    return future.result()
+
+def clear_ai_results():
+    with _ai_results_lock:
+        _ai_results.clear()
+
+def ai_cleaning_recommendations(df: pd.DataFrame, digest: str):
+    """
+    AI cleaning recommendations for a file, memoized on its content
+    Args:
+        df: Parsed dataset
+        digest: Content hash of the file df was loaded from
+    Returns:
+        DatasetRecommendation; the default rules when the AI request fails.
+        The fallback is not memoized, so a later call asks the model again.
+    """
+    try:
+        return memoized_on_file(digest, request_ai_cleaning_recommendations, df)
+    except Exception as e:
+        app.logger.warning(f"AI recommendations unavailable, using default recommendations: {str(e)}")
+        return create_default_recommendations(df)
+
+def _counts_json(counts: pd.Series):
+    """Per-column counts as a pre-encoded JSON object spliced in as-is by orjson"""
+    counts = counts.astype(np.int64)
+    if counts.index.is_unique:
+        return orjson.Fragment(counts.to_json())
+    # to_json needs unique keys; duplicate column names keep the last count as before
+    return dict(zip(counts.index, counts.tolist()))
+
+def _summarize_frame(df: pd.DataFrame, preview_rows: int = 100):
+    """
+    Compute the upload summary of an in-memory DataFrame in one pass
+    Args:
+        df: Parsed dataset
+        preview_rows: Number of leading rows to keep for display
+    Returns:
+        Tuple of (preview DataFrame, total row count, missing values per column),
+        the same shape as _scan_csv so both paths feed the same response
+    """
+    return df.head(preview_rows), len(df), missing_value_counts(df)
+
+def _scan_csv(df_path: str, preview_rows: int = 100, chunksize: int = 100_000):
+    """
+    Summarise a CSV file chunk by chunk without materializing the whole frame
+    Args:
+        df_path: Path to the CSV file
+        preview_rows: Number of leading rows to keep for display
+        chunksize: Number of rows parsed per chunk
+    Returns:
+        Tuple of (preview DataFrame, total row count, missing values per column)
+    """
+    preview_df = None
+    missing_values = None
+    total_rows = 0
+    for chunk in pd.read_csv(df_path, chunksize=chunksize):
+        if preview_df is None:
+            preview_df = chunk.head(preview_rows)
+            missing_values = missing_value_counts(chunk)
+        else:
+            missing_values = missing_values.add(missing_value_counts(chunk), fill_value=0)
+        total_rows += len(chunk)
+    
+    # Header-only file: no chunks were produced
+    if preview_df is None:
+        preview_df = pd.read_csv(df_path, nrows=0)
+        missing_values = missing_value_counts(preview_df)
+    
+    return preview_df, total_rows, missing_values
 
 # LangChain Tool Functions for the Agent
 def detect_missing_values(df_path: str) -> Dict[str, Any]:
@@ -107,7 +397,7 @@ def detect_missing_values(df_path: str) -> Dict[str, Any]:
     """
     try:
         # Handle string input from LangChain
-        if isinstance(df_path, str) and not df_path.endswith(('.csv', '.xlsx')):
+        if isinstance(df_path, str) and _ext(df_path) not in _READERS:
             try:
                 # Try to access the global filepath from the context
                 global filepath
@@ -116,23 +406,24 @@ def detect_missing_values(df_path: str) -> Dict[str, Any]:
                 # If fails, return an error
                 return {"error": "Invalid file path"}
         
-        # Load dataframe
-        if df_path.endswith('.csv'):
-            df = pd.read_csv(df_path)
-        else:
-            df = pd.read_excel(df_path)
-            
-        missing_values = df.isnull().sum().to_dict()
-        missing_percent = {col: (count/len(df))*100 for col, count in missing_values.items()}
-        
-        return {
-            "total_missing": df.isnull().sum().sum(),
-            "columns_with_missing": {k: v for k, v in missing_values.items() if v > 0},
-            "missing_percent": {k: round(v, 2) for k, v in missing_percent.items() if v > 0}
-        }
+        # Load dataframe and build the report
+        return _missing_values_report(load_dataframe(df_path))
     except Exception as e:
         return {"error": str(e)}
 
+def _missing_values_report(df: pd.DataFrame) -> Dict[str, Any]:
+    """Missing value summary of a loaded DataFrame"""
+    # One null scan; percentages and the total are derived from the per-column counts
+    missing_values = missing_value_counts(df)
+    has_missing = missing_values > 0
+    missing_percent = (missing_values[has_missing] / len(df) * 100).round(2)
+    
+    return {
+        "total_missing": int(missing_values.sum()),
+        "columns_with_missing": missing_values[has_missing].to_dict(),
+        "missing_percent": missing_percent.to_dict()
+    }
+
 def detect_outliers(df_path: str, columns: Optional[List[str]] = None, method: str = "zscore") -> Dict[str, Any]:
     """
     Detect outliers in numeric columns
@@ -162,47 +453,64 @@ def detect_outliers(df_path: str, columns: Optional[List[str]] = None, method: s
                 # If parsing fails, continue with original parameters
                 pass
                 
-        # Load dataframe
-        if df_path.endswith('.csv'):
-            df = pd.read_csv(df_path)
-        else:
-            df = pd.read_excel(df_path)
-            
-        # Select numeric columns
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-        
-        # Filter columns if specified
-        if columns:
-            numeric_cols = [col for col in columns if col in numeric_cols]
-            
-        result = {}
-        
-        for col in numeric_cols:
-            if method == "zscore":
-                # Z-score method
-                z_scores = np.abs((df[col] - df[col].mean()) / df[col].std())
-                outliers = z_scores > 3  # Values beyond 3 std devs
-                outlier_count = outliers.sum()
-                outlier_percent = (outlier_count / len(df)) * 100
-            else:  # IQR method
-                Q1 = df[col].quantile(0.25)
-                Q3 = df[col].quantile(0.75)
-                IQR = Q3 - Q1
-                outliers = (df[col] < (Q1 - 1.5 * IQR)) | (df[col] > (Q3 + 1.5 * IQR))
-                outlier_count = outliers.sum()
-                outlier_percent = (outlier_count / len(df)) * 100
-                
-            if outlier_count > 0:
-                result[col] = {
-                    "count": int(outlier_count),
-                    "percent": round(outlier_percent, 2),
-                    "method": method
-                }
-                
-        return result
+        # Load dataframe and build the report
+        return _outliers_report(load_dataframe(df_path), columns, method)
     except Exception as e:
         return {"error": str(e)}
 
+def _outliers_report(df: pd.DataFrame, columns: Optional[List[str]] = None, method: str = "zscore",
+                     stats: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Outlier summary of a loaded DataFrame
+    
+    stats may carry per-column statistics (analyze_dataframe's column_info) of
+    this frame; by default those of an earlier analysis of it are reused, so
+    the z-score mean and std are not recomputed.
+    """
+    # Select numeric columns
+    numeric_cols = _column_group(df, NUMERIC_COLS_ATTR, [np.number])
+    
+    # Filter columns if specified
+    if columns:
+        numeric_cols = [col for col in columns if col in numeric_cols]
+        
+    result = {}
+    if not numeric_cols:
+        return result
+    
+    # Score every numeric column at once on a single float64 block
+    arr = df[numeric_cols].to_numpy(dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if method == "zscore":
+            # Z-score method (sample std, matching pandas). Comparing the deviation with
+            # a per-column 3*std threshold avoids dividing the whole block.
+            if stats is None:
+                stats = cached_column_stats(df)
+            col_stats = [stats.get(col) for col in numeric_cols]
+            if all(cs is not None and cs.get('std') is not None for cs in col_stats):
+                mu = np.array([cs['mean'] for cs in col_stats], dtype=np.float64)
+                sd = np.array([cs['std'] for cs in col_stats], dtype=np.float64)
+            else:
+                mu = np.nanmean(arr, axis=0)
+                sd = np.nanstd(arr, axis=0, ddof=1)
+            outliers = np.abs(arr - mu) > 3 * sd  # Values beyond 3 std devs
+        else:  # IQR method
+            Q1, Q3 = np.nanpercentile(arr, [25, 75], axis=0)
+            IQR = Q3 - Q1
+            outliers = (arr < (Q1 - 1.5 * IQR)) | (arr > (Q3 + 1.5 * IQR))
+    outlier_counts = outliers.sum(axis=0)
+    
+    for col, outlier_count in zip(numeric_cols, outlier_counts.tolist()):
+        if outlier_count > 0:
+            outlier_percent = (outlier_count / len(df)) * 100
+            result[col] = {
+                "count": int(outlier_count),
+                "percent": round(outlier_percent, 2),
+                "method": method
+            }
+            
+    return result
+
 def detect_duplicates(df_path: str) -> Dict[str, Any]:
     """
     Detect duplicate rows in the dataset
@@ -213,7 +521,7 @@ def detect_duplicates(df_path: str) -> Dict[str, Any]:
     """
     try:
         # Handle string input from LangChain
-        if isinstance(df_path, str) and not df_path.endswith(('.csv', '.xlsx')):
+        if isinstance(df_path, str) and _ext(df_path) not in _READERS:
             try:
                 # Try to access the global filepath from the context
                 global filepath
@@ -222,24 +530,25 @@ def detect_duplicates(df_path: str) -> Dict[str, Any]:
                 # If fails, return an error
                 return {"error": "Invalid file path"}
         
-        # Load dataframe
-        if df_path.endswith('.csv'):
-            df = pd.read_csv(df_path)
-        else:
-            df = pd.read_excel(df_path)
-            
-        dup_count = len(df) - len(df.drop_duplicates())
-        dup_percent = (dup_count / len(df)) * 100
-            
-        return {
-            "duplicate_rows": int(dup_count),
-            "duplicate_percent": round(dup_percent, 2),
-            "total_rows": len(df),
-            "unique_rows": len(df.drop_duplicates())
-        }
+        # Load dataframe and build the report
+        return _duplicates_report(load_dataframe(df_path))
     except Exception as e:
         return {"error": str(e)}
 
+def _duplicates_report(df: pd.DataFrame) -> Dict[str, Any]:
+    """Duplicate row summary of a loaded DataFrame"""
+    # One hashing pass; counts are derived from the mask without building a deduplicated copy
+    dup_count = int(df.duplicated().sum())
+    total_rows = len(df)
+    dup_percent = (dup_count / total_rows) * 100
+        
+    return {
+        "duplicate_rows": dup_count,
+        "duplicate_percent": round(dup_percent, 2),
+        "total_rows": total_rows,
+        "unique_rows": total_rows - dup_count
+    }
+
 def generate_statistics(df_path: str) -> Dict[str, Any]:
     """
     Generate descriptive statistics for the dataset
@@ -250,7 +559,7 @@ def generate_statistics(df_path: str) -> Dict[str, Any]:
     """
     try:
         # Handle string input from LangChain
-        if isinstance(df_path, str) and not df_path.endswith(('.csv', '.xlsx')):
+        if isinstance(df_path, str) and _ext(df_path) not in _READERS:
             try:
                 # Try to access the global filepath from the context
                 global filepath
@@ -259,49 +568,113 @@ def generate_statistics(df_path: str) -> Dict[str, Any]:
                 # If fails, return an error
                 return {"error": "Invalid file path"}
         
-        # Load dataframe
-        if df_path.endswith('.csv'):
-            df = pd.read_csv(df_path)
-        else:
-            df = pd.read_excel(df_path)
-            
-        # Basic info
-        num_rows = len(df)
-        num_cols = len(df.columns)
-        
-        # Column types
-        dtypes = df.dtypes.astype(str).to_dict()
-        
-        # Numeric column statistics
-        numeric_stats = {}
-        for col in df.select_dtypes(include=[np.number]).columns:
+        # Load dataframe and build the report
+        return _statistics_report(load_dataframe(df_path))
+    except Exception as e:
+        return {"error": str(e)}
+
+def _statistics_report(df: pd.DataFrame) -> Dict[str, Any]:
+    """Descriptive statistics of a loaded DataFrame"""
+    # Basic info
+    num_rows = len(df)
+    num_cols = len(df.columns)
+    
+    # Column types
+    dtypes = df.dtypes.astype(str).to_dict()
+    
+    # Numeric column statistics, computed in one describe() pass over the numeric block
+    numeric_stats = {}
+    num_df = df[_column_group(df, NUMERIC_COLS_ATTR, [np.number])]
+    if len(num_df.columns) > 0:
+        desc = num_df.describe().T
+        nunique = num_df.nunique()
+        for col in num_df.columns:
             numeric_stats[col] = {
-                "mean": float(df[col].mean()),
-                "median": float(df[col].median()),
-                "std": float(df[col].std()),
-                "min": float(df[col].min()),
-                "max": float(df[col].max()),
-                "unique_values": int(df[col].nunique())
+                "mean": float(desc.at[col, 'mean']),
+                "median": float(desc.at[col, '50%']),
+                "std": float(desc.at[col, 'std']),
+                "min": float(desc.at[col, 'min']),
+                "max": float(desc.at[col, 'max']),
+                "unique_values": int(nunique[col])
             }
-            
-        # Categorical column statistics
-        categorical_stats = {}
-        for col in df.select_dtypes(include=['object']).columns:
-            categorical_stats[col] = {
-                "unique_values": int(df[col].nunique()),
-                "most_common": df[col].value_counts().index[0] if df[col].nunique() > 0 else None,
-                "most_common_count": int(df[col].value_counts().iloc[0]) if df[col].nunique() > 0 else 0
-            }
-            
-        return {
-            "rows": num_rows,
-            "columns": num_cols,
-            "column_types": dtypes,
-            "numeric_stats": numeric_stats,
-            "categorical_stats": categorical_stats
+        
+    # Categorical column statistics
+    categorical_stats = {}
+    for col in _column_group(df, OBJECT_COLS_ATTR, ['object']):
+        value_counts = df[col].value_counts()
+        has_values = len(value_counts) > 0
+        categorical_stats[col] = {
+            "unique_values": int(len(value_counts)),
+            "most_common": value_counts.index[0] if has_values else None,
+            "most_common_count": int(value_counts.iloc[0]) if has_values else 0
         }
-    except Exception as e:
-        return {"error": str(e)}
+        
+    return {
+        "rows": num_rows,
+        "columns": num_cols,
+        "column_types": dtypes,
+        "numeric_stats": numeric_stats,
+        "categorical_stats": categorical_stats
+    }
+
+@lru_cache(maxsize=4)
+def _get_agent_llm(openai_api_key: str) -> ChatOpenAI:
+    """Shared agent LLM client per API key, so its HTTP connection pool is reused across requests"""
+    return ChatOpenAI(
+        model="gpt-3.5-turbo-0125",
+        temperature=0.1,
+        api_key=openai_api_key
+    )
+
+@lru_cache(maxsize=16)
+def _build_data_cleaning_agent(filepath: str, openai_api_key: str):
+    """
+    Build the data cleaning agent, memoized on (filepath, API key)
+    Args:
+        filepath: Path to the dataset file to clean
+        openai_api_key: OpenAI API key the agent's LLM uses
+    Returns:
+        Compiled LangChain agent
+    """
+    llm = _get_agent_llm(openai_api_key)
+    
+    # Create a tool function that runs a report on the DataFrame of filepath.
+    # The frame comes from the shared _load_df cache, so all four tools in a
+    # trajectory reuse one parse while a rewritten file is still picked up.
+    def create_tool_function(report_func, filepath):
+        def tool_function(input_str=""):
+            try:
+                return report_func(load_dataframe(filepath))
+            except Exception as e:
+                return {"error": str(e)}
+        return tool_function
+    
+    # Define tools with proper function wrappers
+    tools = [
+        Tool(
+            name="DetectMissingValues",
+            func=create_tool_function(_missing_values_report, filepath),
+            description="Detects missing values in the dataset"
+        ),
+        Tool(
+            name="DetectOutliers",
+            func=create_tool_function(_outliers_report, filepath),
+            description="Detects outliers in numeric columns using statistical methods"
+        ),
+        Tool(
+            name="DetectDuplicates",
+            func=create_tool_function(_duplicates_report, filepath),
+            description="Identifies duplicate rows in the dataset"
+        ),
+        Tool(
+            name="GenerateStatistics",
+            func=create_tool_function(_statistics_report, filepath),
+            description="Generates descriptive statistics for the dataset"
+        )
+    ]
+    
+    # Initialize agent
+    return create_react_agent(llm, tools, debug=True)
 
 # Initialize LangChain Agent for data cleaning
 def initialize_data_cleaning_agent(filepath):
@@ -310,78 +683,184 @@ def initialize_data_cleaning_agent(filepath):
     Args:
         filepath: Path to the dataset file to clean
     Returns:
-        Initialized LangChain agent
+        Initialized LangChain agent, reused for repeated requests on the same
+        file and API key, or None if it cannot be created
     """
     try:
         # Check OpenAI API key
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key or openai_api_key == "empty-string":
+        if not openai_key_configured():
             raise ValueError("OpenAI API key not properly configured")
             
-        # Initialize LLM
-        llm = ChatOpenAI(
-            model="gpt-3.5-turbo-0125",
-            temperature=0.1,
-            api_key=openai_api_key
-        )
-        
-        # Create a function that captures the filepath in its closure
-        def create_tool_function(func_name, filepath):
-            def tool_function(input_str=""):
-                # Call the appropriate function with the filepath
-                if func_name == "detect_missing_values":
-                    return detect_missing_values(filepath)
-                elif func_name == "detect_outliers":
-                    return detect_outliers(filepath)
-                elif func_name == "detect_duplicates":
-                    return detect_duplicates(filepath)
-                elif func_name == "generate_statistics":
-                    return generate_statistics(filepath)
-                else:
-                    return {"error": f"Unknown function: {func_name}"}
-            return tool_function
-        
-        # Define tools with proper function wrappers
-        tools = [
-            Tool(
-                name="DetectMissingValues",
-                func=create_tool_function("detect_missing_values", filepath),
-                description="Detects missing values in the dataset"
-            ),
-            Tool(
-                name="DetectOutliers",
-                func=create_tool_function("detect_outliers", filepath),
-                description="Detects outliers in numeric columns using statistical methods"
-            ),
-            Tool(
-                name="DetectDuplicates",
-                func=create_tool_function("detect_duplicates", filepath),
-                description="Identifies duplicate rows in the dataset"
-            ),
-            Tool(
-                name="GenerateStatistics",
-                func=create_tool_function("generate_statistics", filepath),
-                description="Generates descriptive statistics for the dataset"
-            )
-        ]
-        
-        # Initialize agent
-        agent = create_react_agent(llm, tools, debug=True)
-        
-        return agent
+        return _build_data_cleaning_agent(filepath, OPENAI_API_KEY)
     except Exception as e:
         app.logger.error(f"Error initializing agent: {str(e)}")
         return None
 
+def run_ai_analysis(filepath: str, digest: str) -> Dict[str, Any]:
+    """
+    Run the LLM-bound part of the upload analysis
+    Args:
+        filepath: Path to the uploaded dataset
+        digest: Content hash of the file, used to share results with /clean
+    Returns:
+        Dictionary with the agent analysis and the AI cleaning recommendations
+    """
+    df = load_dataframe(filepath)
+    result = {}
+    
+    # Initialize the LangChain agent for initial analysis
+    agent = initialize_data_cleaning_agent(filepath)
+    
+    # The agent run and the recommendations are independent LLM calls, so run them together
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        agent_future = executor.submit(
+            agent.invoke,
+            "Analyze this dataset and provide comprehensive recommendations for cleaning. "
+            "Focus on detecting missing values, outliers, and duplicates."
+        ) if agent else None
+        recommendations_future = executor.submit(ai_cleaning_recommendations, df, digest)
+        
+        if agent_future:
+            result['agent_analysis'] = agent_future.result()
+        # Convert Pydantic model to dict
+        result['ai_recommendations'] = recommendations_future.result().model_dump()
+    
+    return result
+
+def _analysis_job_path(job_id: str) -> str:
+    return os.path.join(app.config['UPLOAD_FOLDER'], f"{job_id}{ANALYSIS_SUFFIX}")
+
+def _write_json(path: str, obj: Any):
+    # Replace atomically so a concurrent reader never sees a half-written file; the
+    # temporary name is per call since identical uploads may write the same path
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(obj, default=_json_default, option=ORJSON_OPTIONS))
+    os.replace(tmp_path, path)
+
+def _write_analysis_job(job_id: str, state: Dict[str, Any]):
+    _write_json(_analysis_job_path(job_id), state)
+
+def _run_analysis_job(job_id: str, filepath: str, digest: str):
+    try:
+        _write_analysis_job(job_id, {'status': 'done', 'result': run_ai_analysis(filepath, digest)})
+    except Exception as e:
+        app.logger.warning(f"AI analysis failed, but basic analysis is unaffected: {str(e)}")
+        _write_analysis_job(job_id, {'status': 'failed', 'error': str(e)})
+
+def _prune_analysis_jobs():
+    """Remove analysis job files last written more than ANALYSIS_JOB_TTL seconds ago"""
+    cutoff = time.time() - ANALYSIS_JOB_TTL
+    with os.scandir(app.config['UPLOAD_FOLDER']) as entries:
+        for entry in entries:
+            if entry.name.endswith(ANALYSIS_SUFFIX) and entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # The process exists but belongs to another user
+        return True
+    return True
+
+def read_analysis_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    State of an analysis job, or None if there is no such job
+    
+    A pending job whose owning process is gone (worker restart or crash), or that
+    has been running longer than ANALYSIS_JOB_TIMEOUT, is reported and stored as failed.
+    """
+    path = _analysis_job_path(job_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        state = orjson.loads(f.read())
+    
+    if state['status'] == 'pending':
+        started = state.get('started', os.path.getmtime(path))
+        if time.time() - started > ANALYSIS_JOB_TIMEOUT:
+            state = {'status': 'failed', 'error': 'Analysis timed out'}
+        elif 'pid' in state and not _process_alive(state['pid']):
+            state = {'status': 'failed', 'error': 'Analysis was interrupted by a server restart'}
+        if state['status'] == 'failed':
+            _write_analysis_job(job_id, state)
+    return state
+
+def submit_analysis_job(filepath: str, digest: str) -> str:
+    """Start run_ai_analysis in the background and return the id to poll it with"""
+    try:
+        _prune_analysis_jobs()
+    except OSError as e:
+        app.logger.warning(f"Could not prune old analysis jobs: {str(e)}")
+    
+    job_id = uuid.uuid4().hex
+    # Job state lives in the upload folder so any worker process can answer the poll.
+    # The owning process and start time let a poll detect a job that can no longer finish.
+    _write_analysis_job(job_id, {'status': 'pending', 'started': time.time(), 'pid': os.getpid()})
+    _analysis_pool.submit(_run_analysis_job, job_id, filepath, digest)
+    return job_id
+
+def _stream_digest(stream) -> str:
+    """Content hash of an uploaded file stream, rewound afterwards for saving"""
+    digest = hashlib.blake2b(digest_size=16)
+    for block in iter(lambda: stream.read(1 << 20), b''):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+def _save_stream(stream, path: str):
+    """
+    Write an uploaded file stream to disk
+    Args:
+        stream: Seekable upload stream, positioned at the start
+        path: Destination file path
+    """
+    # Write under a private name and move it into place, so a concurrent upload
+    # of the same file never sees (and parses) a partially written copy
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'wb') as dst:
+            _copy_stream(stream, dst)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _copy_stream(stream, dst):
+    """Copy an upload stream, positioned at the start, into an open binary file"""
+    # Werkzeug spools large uploads to a temporary file; copy that in-kernel
+    try:
+        size = os.fstat(stream.fileno()).st_size
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(dst.fileno(), stream.fileno(), offset, size - offset)
+            if not sent:
+                raise OSError("sendfile made no progress")
+            offset += sent
+        return
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        # In-memory streams (small uploads) or no sendfile support on this platform
+        stream.seek(0)
+        dst.seek(0)
+        dst.truncate()
+    shutil.copyfileobj(stream, dst, length=1 << 20)
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     try:
         # Check if the request has the 'file' part
         if 'file' not in request.files:
             app.logger.error("No file part in the request")
-            app.logger.debug(f"Request headers: {request.headers}")
-            app.logger.debug(f"Request form: {request.form}")
-            app.logger.debug(f"Request files: {request.files}")
+            app.logger.debug("Request headers: %s", request.headers)
+            app.logger.debug("Request form: %s", request.form)
+            app.logger.debug("Request files: %s", request.files)
             return jsonify({'error': 'No file part'}), 400
         
         file = request.files['file']
@@ -393,80 +872,91 @@ def upload_file():
             app.logger.error(f"File type not allowed: {file.filename}")
             return jsonify({'error': f'File type not allowed. Please use one of: {", ".join(ALLOWED_EXTENSIONS)}'}), 400
         
-        # Ensure upload directory exists
-        if not os.path.exists(app.config['UPLOAD_FOLDER']):
-            os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-            
         filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        saved_filename = f"{timestamp}_{filename}"
+        # Name uploads by content hash so an identical re-upload finds the saved copy
+        digest = _stream_digest(file.stream)
+        saved_filename = f"{digest}_{filename}"
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], saved_filename)
+        meta_path = filepath + UPLOAD_META_SUFFIX
+        key_fingerprint = openai_key_fingerprint()
+        ai_enabled = key_fingerprint is not None
         
-        app.logger.info(f"Saving file to {filepath}")
-        file.save(filepath)
-        app.logger.info(f"File saved successfully to {filepath}")
+        if os.path.exists(filepath):
+            app.logger.info(f"Identical file already saved as {filepath}")
+            # Replay the stored response if it was built with the same API key
+            if os.path.exists(meta_path):
+                with open(meta_path, 'rb') as f:
+                    meta = orjson.loads(f.read())
+                if 'key_fingerprint' in meta and meta['key_fingerprint'] == key_fingerprint:
+                    response = meta['response']
+                    # Analysis jobs are not stored with the response; each upload polls a fresh one
+                    if ai_enabled:
+                        try:
+                            response['data_info']['analysis_job_id'] = submit_analysis_job(filepath, digest)
+                        except Exception as ai_error:
+                            app.logger.warning(f"AI analysis failed, but will continue with basic analysis: {str(ai_error)}")
+                    app.logger.info(f"File processed successfully: {saved_filename}")
+                    return jsonify(response), 200
+        else:
+            app.logger.info(f"Saving file to {filepath}")
+            _save_stream(file.stream, filepath)
+            app.logger.info(f"File saved successfully to {filepath}")
+            
+            # A new upload supersedes previously parsed files
+            clear_dataframe_cache()
         
         # Read the file and get initial data info
         try:
             app.logger.info(f"Processing file {filepath}")
-            if filename.endswith('.csv'):
-                df = pd.read_csv(filepath)
+            
+            # Only the AI analysis needs the full frame; otherwise stream the CSV for the summary
+            if ai_enabled or _ext(filename) != '.csv':
+                df = load_dataframe(filepath)
+                preview_df, total_rows, missing_values = _summarize_frame(df, preview_rows=100)
             else:
-                df = pd.read_excel(filepath)
+                preview_df, total_rows, missing_values = _scan_csv(filepath, preview_rows=100)
             
             # Get basic dataset information
             data_info = {
-                'rows': int(len(df)),
-                'columns': int(len(df.columns)),
-                'column_names': df.columns.tolist(),
-                'missing_values': {col: int(val) for col, val in df.isnull().sum().to_dict().items()},
+                'rows': int(total_rows),
+                'columns': int(len(preview_df.columns)),
+                'column_names': preview_df.columns.tolist(),
+                'missing_values': _counts_json(missing_values),
                 'file_name': saved_filename
             }
             
             # Include a sample of the data (first 100 rows) for display in the datatable
-            sample_data = df.head(100).fillna('').to_dict(orient='records')
+            sample_data = preview_df.fillna('').to_dict(orient='records')
+            
+            # Get AI analysis only if OpenAI key is configured
+            if ai_enabled:
+                try:
+                    # More detailed analysis; NumPy values are encoded by the orjson provider
+                    data_info['detailed_analysis'] = memoized_on_file(
+                        digest, analyze_dataframe, df, missing_values=missing_values
+                    )
+                except Exception as ai_error:
+                    app.logger.warning(f"AI analysis failed, but will continue with basic analysis: {str(ai_error)}")
             
-            # Get AI analysis if OpenAI key is configured
+            response = {
+                'message': 'File uploaded successfully',
+                'data_info': data_info,
+                'data': sample_data
+            }
             try:
-                openai_api_key = os.getenv("OPENAI_API_KEY")
-                if openai_api_key and openai_api_key != "empty-string":
-                    # More detailed analysis
-                    df_analysis = analyze_dataframe(df)
-                    # Convert df_analysis to JSON-serializable dict
-                    data_info['detailed_analysis'] = json.loads(json.dumps(df_analysis, cls=NumpyEncoder))
-                    
-                    # Initialize and run the LangChain agent for initial analysis
-                    agent = initialize_data_cleaning_agent(filepath)
-                    if agent:
-                        agent_analysis = agent.invoke(
-                            "Analyze this dataset and provide comprehensive recommendations for cleaning. "
-                            "Focus on detecting missing values, outliers, and duplicates."
-                        )
-                        data_info['agent_analysis'] = agent_analysis
-                    
-                    # Try to get AI recommendations
-                    ai_recommendations = get_ai_cleaning_recommendations(df)
-                    # Convert Pydantic model to dict and ensure it's JSON-serializable
-                    ai_recommendations_dict = ai_recommendations.dict()
-                    data_info['ai_recommendations'] = json.loads(json.dumps(ai_recommendations_dict, cls=NumpyEncoder))
-            except Exception as ai_error:
-                app.logger.warning(f"AI analysis failed, but will continue with basic analysis: {str(ai_error)}")
+                _write_json(meta_path, {'key_fingerprint': key_fingerprint, 'response': response})
+            except Exception as e:
+                app.logger.warning(f"Could not store upload response for {filepath}: {str(e)}")
+            
+            if ai_enabled:
+                try:
+                    # The LLM-bound agent run and recommendations are polled via /analysis/<job_id>
+                    data_info['analysis_job_id'] = submit_analysis_job(filepath, digest)
+                except Exception as ai_error:
+                    app.logger.warning(f"AI analysis failed, but will continue with basic analysis: {str(ai_error)}")
             
             app.logger.info(f"File processed successfully: {saved_filename}")
-            try:
-                return jsonify({
-                    'message': 'File uploaded successfully',
-                    'data_info': data_info,
-                    'data': sample_data
-                }), 200
-            except TypeError as json_error:
-                app.logger.error(f"JSON serialization error: {str(json_error)}")
-                # Convert data_info to a fully serializable format
-            return jsonify({
-                'message': 'File uploaded successfully',
-                    'data_info': json.loads(json.dumps(data_info, cls=NumpyEncoder)),
-                    'data': json.loads(json.dumps(sample_data, cls=NumpyEncoder))
-            }), 200
+            return jsonify(response), 200
         except Exception as e:
             app.logger.error(f"Error processing file: {str(e)}")
             return jsonify({'error': f'Error processing file: {str(e)}'}), 500
@@ -518,15 +1008,12 @@ def clean_data():
         if not os.path.exists(filepath):
             return jsonify({'error': 'File not found'}), 404
         
-        # Read the file
-        if filename.endswith('.csv'):
-            df = pd.read_csv(filepath)
-        else:
-            df = pd.read_excel(filepath)
+        # Read the file (reuses the DataFrame parsed during upload)
+        df = load_dataframe(filepath)
         
         # Check if OpenAI API is configured
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key or openai_api_key == "empty-string":
+        ai_enabled = openai_key_configured()
+        if not ai_enabled:
             app.logger.warning("OpenAI API key not configured, will use default recommendations")
         
         # Log the cleaning options for debugging
@@ -539,7 +1026,8 @@ def clean_data():
             # First try with LangChain agent for suggestions
             agent_suggestions = ""
             try:
-                agent = initialize_data_cleaning_agent(filepath)
+                # Without a key the agent cannot run, so don't build it
+                agent = initialize_data_cleaning_agent(filepath) if ai_enabled else None
                 if agent:
                     agent_suggestions = agent.invoke(
                         "Analyze this dataset and provide comprehensive recommendations for cleaning. "
@@ -556,8 +1044,9 @@ def clean_data():
             
             # Try the AI cleaning function which includes recommendations and application
             try:
-                # Directly call the ai_clean_dataset function
-                cleaned_df, report = ai_clean_dataset(df)
+                # Recommend and apply, reusing the recommendations made at upload
+                recommendations = ai_cleaning_recommendations(df, file_digest(filepath))
+                cleaned_df, report = apply_ai_recommendations(df, recommendations)
                 app.logger.info(f"AI cleaning completed with {len(report.get('audit_log', []))} operations")
                 
                 # If no cleaning was actually performed, use the fallback basic cleaning
@@ -613,10 +1102,7 @@ def clean_data():
         cleaned_filename = f"cleaned_{filename}"
         cleaned_filepath = os.path.join(app.config['UPLOAD_FOLDER'], cleaned_filename)
         
-        if filename.endswith('.csv'):
-            cleaned_df.to_csv(cleaned_filepath, index=False)
-        else:
-            cleaned_df.to_excel(cleaned_filepath, index=False)
+        _WRITERS[_ext(filename)](cleaned_df, cleaned_filepath)
         
         # Add human-readable report
         report['human_readable'] = (
@@ -629,31 +1115,10 @@ def clean_data():
             f"based on the characteristics of each column."
         )
         
-        try:
-            # Use our custom NumpyEncoder to handle serialization issues
-            return jsonify({
-                'message': 'Data cleaned successfully',
-                'report': json.loads(json.dumps(report, cls=NumpyEncoder)),
-                'cleaned_filename': cleaned_filename
-            }), 200
-        except TypeError as json_error:
-            app.logger.error(f"JSON serialization error in clean_data: {str(json_error)}")
-            # Make another attempt with manual conversion of problematic types
-            simplified_report = {
-                'original_rows': int(report.get('original_rows', 0)),
-                'final_rows': int(report.get('final_rows', 0)),
-                'duplicates_removed': int(report.get('duplicates_removed', 0)),
-                'human_readable': report.get('human_readable', ''),
-                'agent_suggestions': report.get('agent_suggestions', '')
-            }
-            
-            # Add the audit log if it exists
-            if 'audit_log' in report:
-                simplified_report['audit_log'] = report['audit_log']
-        
+        # Serialized once by the orjson provider, which handles NumPy values
         return jsonify({
             'message': 'Data cleaned successfully',
-                'report': simplified_report,
+            'report': report,
             'cleaned_filename': cleaned_filename
         }), 200
         
@@ -661,17 +1126,35 @@ def clean_data():
         app.logger.error(f"Error in clean_data: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/analysis/<job_id>', methods=['GET'])
+def get_analysis(job_id):
+    try:
+        # Job ids are uuid4 hex strings; anything else can't name a job file
+        state = read_analysis_job(job_id) if ANALYSIS_JOB_ID.fullmatch(job_id) else None
+        if state is None:
+            return jsonify({'error': 'Analysis job not found'}), 404
+        
+        return jsonify(state), 202 if state['status'] == 'pending' else 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/download/<filename>', methods=['GET'])
 def download_file(filename):
     try:
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        if not os.path.exists(filepath):
+        # Only datasets are served; parsed frames, upload metadata and job state stay internal
+        if not allowed_file(filename) or not os.path.exists(filepath):
             return jsonify({'error': 'File not found'}), 404
         
         return send_file(
             filepath,
             as_attachment=True,
-            download_name=filename
+            download_name=filename,
+            # Answer If-None-Match / If-Modified-Since with 304 when unchanged
+            conditional=True,
+            etag=True,
+            last_modified=os.path.getmtime(filepath)
         )
         
     except Exception as e:
@@ -679,6 +1162,7 @@ def download_file(filename):
 
 @app.route('/set-api-key', methods=['POST'])
 def set_api_key():
+    global OPENAI_API_KEY
     try:
         data = request.json
         api_key = data.get('api_key')
@@ -693,7 +1177,13 @@ def set_api_key():
         # Store the API key in the session
         # Note: This will only persist for the current session
         # and won't modify the .env file
+        OPENAI_API_KEY = api_key
+        # The cleaning utilities read the key from the environment
         os.environ["OPENAI_API_KEY"] = api_key
+        # Agents built with the previous key are no longer valid
+        _build_data_cleaning_agent.cache_clear()
+        _get_agent_llm.cache_clear()
+        clear_ai_results()
         app.logger.info("Custom API key set for this session")
         
         return jsonify({
@@ -708,4 +1198,4 @@ def set_api_key():
 if __name__ == '__main__':
     # Log application startup
     app.logger.info("Starting Flask application on port 8000")
-    app.run(debug=True, port=8000) 
\ No newline at end of file
+    app.run(debug=DEBUG, port=8000) 
\ No newline at end of file
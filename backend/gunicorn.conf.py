@@ -0,0 +1,16 @@
+import os
+
+# Threaded workers: pandas parsing and the OpenAI calls release the GIL, so one
+# slow upload or LLM round-trip no longer blocks every other client.
+# A single process by default: /set-api-key and the in-memory caches are per
+# process, so concurrency is scaled with threads rather than workers.
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# Agent runs on an upload can take well over gunicorn's default 30s
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+
+# The app is not preloaded: the LLM cache opens its SQLite connection at import
+# time and that must not be shared across forked workers.
+preload_app = False
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# app.py imports its helpers as the top-level "utils" package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """The Flask app module with uploads, caches and the LLM cache in a temporary directory"""
+    monkeypatch.setenv('LLM_CACHE_PATH', str(tmp_path / 'llm_cache.db'))
+    # The uploads folder is created relative to the working directory at import
+    monkeypatch.chdir(tmp_path)
+    import app as app_module
+
+    monkeypatch.setattr(app_module, 'OPENAI_API_KEY', None)
+    monkeypatch.setitem(app_module.app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    app_module.clear_dataframe_cache()
+    app_module.clear_ai_results()
+    yield app_module
+    app_module.clear_dataframe_cache()
+    app_module.clear_ai_results()
@@ -0,0 +1,192 @@
+import io
+import itertools
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import orjson
+import pandas as pd
+
+
+def _wait_for_job(app_module, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        state = app_module.read_analysis_job(job_id)
+        if state['status'] != 'pending':
+            return state
+        time.sleep(0.01)
+    raise AssertionError(f"analysis job {job_id} still pending")
+
+
+def test_analysis_job_goes_from_pending_to_done(app_module, monkeypatch):
+    release = threading.Event()
+
+    def run_ai_analysis(filepath, digest):
+        release.wait(5)
+        return {'answer': 42}
+
+    monkeypatch.setattr(app_module, 'run_ai_analysis', run_ai_analysis)
+    job_id = app_module.submit_analysis_job('data.csv', 'digest')
+    client = app_module.app.test_client()
+
+    pending = client.get(f'/analysis/{job_id}')
+    assert pending.status_code == 202
+    assert pending.get_json()['status'] == 'pending'
+
+    release.set()
+    assert _wait_for_job(app_module, job_id) == {'status': 'done', 'result': {'answer': 42}}
+    assert client.get(f'/analysis/{job_id}').status_code == 200
+
+
+def test_analysis_job_failure_is_reported(app_module, monkeypatch):
+    def run_ai_analysis(filepath, digest):
+        raise RuntimeError("OpenAI unavailable")
+
+    monkeypatch.setattr(app_module, 'run_ai_analysis', run_ai_analysis)
+    job_id = app_module.submit_analysis_job('data.csv', 'digest')
+
+    assert _wait_for_job(app_module, job_id) == {'status': 'failed', 'error': 'OpenAI unavailable'}
+
+
+def test_pending_job_of_a_dead_process_is_failed(app_module):
+    # A finished child's pid no longer names a running process
+    child = subprocess.Popen([sys.executable, '-c', 'pass'])
+    child.wait()
+    job_id = 'a' * 32
+    app_module._write_analysis_job(job_id, {'status': 'pending', 'started': time.time(), 'pid': child.pid})
+
+    state = app_module.read_analysis_job(job_id)
+    assert state['status'] == 'failed'
+    # The verdict is stored, so later polls agree without checking the process again
+    assert app_module.read_analysis_job(job_id)['status'] == 'failed'
+
+
+def test_pending_job_past_the_timeout_is_failed(app_module):
+    job_id = 'b' * 32
+    started = time.time() - app_module.ANALYSIS_JOB_TIMEOUT - 1
+    app_module._write_analysis_job(job_id, {'status': 'pending', 'started': started, 'pid': os.getpid()})
+
+    assert app_module.read_analysis_job(job_id)['status'] == 'failed'
+
+
+def test_unknown_analysis_job_is_not_found(app_module):
+    client = app_module.app.test_client()
+    assert client.get(f"/analysis/{'c' * 32}").status_code == 404
+    assert client.get('/analysis/not-a-job-id').status_code == 404
+
+
+def _write_csv(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_parsed_pickle_is_ignored_once_the_source_changes(app_module, tmp_path):
+    path = _write_csv(tmp_path / 'data.csv', "a,b\n1,x\n2,y\n")
+    app_module.load_dataframe(path)
+    parsed_path = path + app_module.PARSED_SUFFIX
+    assert os.path.exists(parsed_path)
+    # The pickle is moved into place, so no temporary file is left behind
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+    # Rewrite the source with a different layout, newer than the pickle
+    _write_csv(tmp_path / 'data.csv', "a,b,c\nx,1,2.5\ny,2,3.5\n")
+    later = os.path.getmtime(parsed_path) + 10
+    os.utime(path, (later, later))
+    app_module.clear_dataframe_cache()
+
+    df = app_module.load_dataframe(path)
+    assert list(df.columns) == ['a', 'b', 'c']
+    assert app_module._column_group(df, app_module.NUMERIC_COLS_ATTR, [np.number]) == ['b', 'c']
+
+
+def test_unreadable_parsed_pickle_is_parsed_again(app_module, tmp_path):
+    path = _write_csv(tmp_path / 'data.csv', "a,b\n1,x\n2,y\n")
+    parsed_path = path + app_module.PARSED_SUFFIX
+    with open(parsed_path, 'wb') as f:
+        f.write(b'truncated')
+    later = os.path.getmtime(path) + 10
+    os.utime(parsed_path, (later, later))
+
+    df = app_module.load_dataframe(path)
+    assert df['a'].tolist() == [1, 2]
+    # The damaged pickle has been replaced by a readable one
+    assert pd.read_pickle(parsed_path)['a'].tolist() == [1, 2]
+
+
+def test_column_groups_are_recomputed_for_derived_frames(app_module, tmp_path):
+    path = _write_csv(tmp_path / 'data.csv', "a,b,c\n1,x,2.5\n2,y,3.5\n")
+    df = app_module.load_dataframe(path)
+
+    def numeric(frame):
+        return app_module._column_group(frame, app_module.NUMERIC_COLS_ATTR, [np.number])
+
+    def objects(frame):
+        return app_module._column_group(frame, app_module.OBJECT_COLS_ATTR, ['object'])
+
+    assert numeric(df) == ['a', 'c']
+    assert objects(df) == ['b']
+
+    # Derived frames carry the parsed attrs, but not the parsed layout
+    subset = df[['b', 'c']]
+    assert numeric(subset) == ['c']
+    assert objects(subset) == ['b']
+    retyped = df.astype({'a': str})
+    assert numeric(retyped) == ['c']
+    assert objects(retyped) == ['a', 'b']
+
+    # Reports on a column subset only look at the columns it has
+    assert set(app_module._statistics_report(subset)['numeric_stats']) == {'c'}
+
+
+UPLOAD_CSV = b"a,b\n1,x\n2,y\n"
+
+
+def _upload(client):
+    return client.post(
+        '/upload',
+        data={'file': (io.BytesIO(UPLOAD_CSV), 'data.csv')},
+        content_type='multipart/form-data',
+    ).get_json()
+
+
+def _mark_stored_response(app_module, saved_filename):
+    """Tag the stored /upload response so a replay can be told apart from a rebuild"""
+    meta_path = os.path.join(app_module.app.config['UPLOAD_FOLDER'], saved_filename + app_module.UPLOAD_META_SUFFIX)
+    with open(meta_path, 'rb') as f:
+        meta = orjson.loads(f.read())
+    # Job ids belong to one upload and are never stored
+    assert 'analysis_job_id' not in meta['response']['data_info']
+    meta['response']['message'] = 'replayed'
+    app_module._write_json(meta_path, meta)
+
+
+def test_upload_is_replayed_only_for_the_same_api_key(app_module, monkeypatch):
+    job_ids = itertools.count()
+    monkeypatch.setattr(app_module, 'submit_analysis_job', lambda filepath, digest: f"{next(job_ids):032x}")
+    client = app_module.app.test_client()
+
+    first = _upload(client)
+    assert first['message'] == 'File uploaded successfully'
+    saved_filename = first['data_info']['file_name']
+    _mark_stored_response(app_module, saved_filename)
+    assert _upload(client)['message'] == 'replayed'
+
+    # A response built without a key is not replayed once one is configured
+    monkeypatch.setattr(app_module, 'OPENAI_API_KEY', 'sk-' + 'a' * 40)
+    with_key = _upload(client)
+    assert with_key['message'] == 'File uploaded successfully'
+    assert 'detailed_analysis' in with_key['data_info']
+    first_job = with_key['data_info']['analysis_job_id']
+
+    # The same key replays it, with a job of its own
+    _mark_stored_response(app_module, saved_filename)
+    replayed = _upload(client)
+    assert replayed['message'] == 'replayed'
+    assert replayed['data_info']['analysis_job_id'] != first_job
+
+    # A different key rebuilds it again
+    monkeypatch.setattr(app_module, 'OPENAI_API_KEY', 'sk-' + 'b' * 40)
+    assert _upload(client)['message'] == 'File uploaded successfully'
@@ -2,14 +2,18 @@ import pandas as pd
 import numpy as np
 from typing import Dict, Tuple, Any, List, Optional
 import os
-from sklearn.preprocessing import StandardScaler
-import json
+import re
+import orjson
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from langchain.output_parsers import PydanticOutputParser
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from langchain_core.messages import HumanMessage
 
@@ -17,6 +21,10 @@ from langchain_core.messages import HumanMessage
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Copy-on-write: derived frames share buffers with their source until a column is
+# written, so cleaning copies only the columns it changes
+pd.set_option("mode.copy_on_write", True)
+
 class DataCleaningRecommendation(BaseModel):
     """Recommendations for data cleaning from AI"""
     column_name: str = Field(description="Name of the column")
@@ -32,68 +40,210 @@ class DatasetRecommendation(BaseModel):
     duplicate_removal: bool = Field(description="Whether to remove duplicates")
     column_recommendations: List[DataCleaningRecommendation] = Field(description="Recommendations for each column")
     overall_advice: str = Field(description="General advice for the dataset")
+    # Domain detection made while recommending, reused when the recommendations are applied
+    _is_ecommerce: Optional[bool] = PrivateAttr(default=None)
+
+def _audit_entry(operation: str, column: Optional[str] = None, details: Optional[Dict[str, Any]] = None,
+                 rows_affected: Optional[int] = None) -> Dict[str, Any]:
+    """
+    A cleaning audit log entry: operation performed, column affected if
+    applicable, operation details and number of rows affected
+    
+    The timestamp is stored as epoch seconds; _format_audit_timestamps turns
+    it into the ISO string once the cleaning run is done.
+    """
+    return {
+        'timestamp': time.time(),
+        'operation': operation,
+        'column': column,
+        'details': details if details is not None else {},
+        'rows_affected': int(rows_affected) if rows_affected is not None else None,
+    }
 
-class DataAuditLog(BaseModel):
-    """Audit log entry for tracking data cleaning operations"""
-    timestamp: str = Field(description="Time of operation")
-    operation: str = Field(description="Operation performed")
-    column: Optional[str] = Field(description="Column affected if applicable")
-    details: Dict[str, Any] = Field(description="Operation details")
-    rows_affected: Optional[int] = Field(description="Number of rows affected")
+def _format_audit_timestamps(audit_log: List[Dict[str, Any]]) -> None:
+    for entry in audit_log:
+        entry['timestamp'] = datetime.fromtimestamp(entry['timestamp']).isoformat()
 
-def analyze_dataframe(df: pd.DataFrame) -> Dict[str, Any]:
+# Columns described per recommendation prompt, and how many prompts run at once
+_PROMPT_COLUMN_BATCH = 50
+_PROMPT_MAX_CONCURRENCY = 4
+
+# Compact JSON schema of the recommendation response, built once at import
+_RECOMMENDATION_FORMAT_INSTRUCTIONS = (
+    "Respond with a single JSON object that conforms to this JSON schema:\n"
+    + orjson.dumps(DatasetRecommendation.model_json_schema()).decode()
+)
+
+@lru_cache(maxsize=2)
+def _recommendation_prompt(is_ecommerce: bool) -> PromptTemplate:
+    """The recommendation prompt, built once per domain variant"""
+    template = """
+    You are an expert data scientist providing recommendations for cleaning a dataset.
+    
+    Here's the analysis of the dataset, with one list per field aligned with column_names
+    (min, max, mean and median are null for non-numeric columns):
+    {analysis}
+    """
+    
+    # Add domain-specific context if detected
+    if is_ecommerce:
+        template += """
+        This appears to be an e-commerce dataset. When making recommendations, consider:
+        1. Price columns should be positive and may need special outlier handling
+        2. Quantity/inventory columns should be non-negative integers
+        3. Order/transaction dates should be standardized
+        4. Product IDs and SKUs should be unique and well-formatted
+        5. Customer IDs typically should not have missing values
+        6. Duplicate order entries may indicate data issues
+        """
+    
+    template += """
+    Based on this analysis, provide detailed recommendations for cleaning this dataset.
+    Focus on handling missing values, outliers, and whether duplicates should be removed.
+    For each column, suggest the best approach based on the data characteristics.
+    
+    {format_instructions}
+    """
+    
+    return PromptTemplate(
+        template=template,
+        input_variables=["analysis"],
+        partial_variables={"format_instructions": _RECOMMENDATION_FORMAT_INSTRUCTIONS}
+    )
+
+@lru_cache(maxsize=4)
+def _get_llm(openai_api_key: str) -> ChatOpenAI:
+    """Shared cleaning LLM client per API key, so its HTTP connection pool is reused across calls"""
+    return ChatOpenAI(
+        model="gpt-3.5-turbo-0125",
+        temperature=0,
+        api_key=openai_api_key
+    )
+
+# Recent analyze_dataframe results: id(df) -> (weak reference to df, layout key, analysis)
+_ANALYSIS_CACHE_SIZE = 10
+_analysis_cache = OrderedDict()
+_analysis_cache_lock = threading.Lock()
+
+def missing_value_counts(df: pd.DataFrame) -> pd.Series:
+    """Null count per column from a single reduction over the frame's null mask"""
+    return pd.Series(df.isna().to_numpy().sum(axis=0), index=df.columns, dtype=np.int64)
+
+def _frame_layout(df: pd.DataFrame) -> Tuple:
+    return (df.shape, tuple(df.columns), tuple(str(dtype) for dtype in df.dtypes))
+
+def _cached_analysis(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
+    """Return the memoized analysis of this DataFrame object, or None if there is none"""
+    layout = _frame_layout(df)
+    with _analysis_cache_lock:
+        cached = _analysis_cache.get(id(df))
+        # The weak reference guards against a new frame reusing the id of a collected one
+        if cached is not None and cached[0]() is df and cached[1] == layout:
+            _analysis_cache.move_to_end(id(df))
+            return cached[2]
+    return None
+
+def cached_column_stats(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """Per-column statistics of this DataFrame object if it was already analyzed, else {}"""
+    analysis = _cached_analysis(df)
+    return analysis['column_info'] if analysis is not None else {}
+
+def analyze_dataframe(df: pd.DataFrame, missing_values: Optional[pd.Series] = None) -> Dict[str, Any]:
     """
     Analyze the dataframe to get basic statistics and metadata
+    
+    missing_values may carry per-column null counts the caller already
+    computed, so the frame is not scanned for nulls a second time.
+    Analyzing the same (unmodified) DataFrame object again returns the cached,
+    shared result, which callers must not mutate.
     """
+    analysis = _cached_analysis(df)
+    if analysis is not None:
+        return analysis
+    
+    analysis = _analyze_dataframe(df, missing_values)
+    with _analysis_cache_lock:
+        _analysis_cache[id(df)] = (weakref.ref(df), _frame_layout(df), analysis)
+        _analysis_cache.move_to_end(id(df))
+        if len(_analysis_cache) > _ANALYSIS_CACHE_SIZE:
+            _analysis_cache.popitem(last=False)
+    return analysis
+
+def _analyze_dataframe(df: pd.DataFrame, missing_values: Optional[pd.Series]) -> Dict[str, Any]:
+    if missing_values is None:
+        missing_values = missing_value_counts(df)
+    
     analysis = {
         'rows': len(df),
         'columns': len(df.columns),
         'column_info': {},
-        'missing_values': df.isnull().sum().to_dict(),
-        'potential_duplicates': len(df) - len(df.drop_duplicates()),
+        'missing_values': missing_values.to_dict(),
+        'potential_duplicates': int(df.duplicated().sum()),
     }
     
+    # String columns are factorized once: the distinct non-null values give the unique
+    # count and samples, and the codes give category counts without a second hash pass.
+    # The other columns are counted at frame level.
+    string_uniques = {}
+    string_categories = {}
+    categorical_limit = min(10, len(df) * 0.05)
+    for column in df.columns:
+        if df[column].dtype == 'object' or df[column].dtype == 'string':
+            codes, uniques = pd.factorize(df[column].to_numpy())
+            string_uniques[column] = uniques
+            if len(uniques) <= categorical_limit:
+                counts = pd.Series(np.bincount(codes[codes >= 0], minlength=len(uniques)), index=uniques)
+                string_categories[column] = counts.sort_values(ascending=False).to_dict()
+    nunique = df[[column for column in df.columns if column not in string_uniques]].nunique()
+    
+    # Whole-frame reductions, computed once instead of column by column
+    numeric_columns = [column for column in df.columns if np.issubdtype(df[column].dtype, np.number)]
+    is_numeric = set(numeric_columns)
+    if numeric_columns:
+        num_df = df[numeric_columns]
+        # One aggregation over the numeric block, as {column: {stat: value}}
+        stats = num_df.agg(['min', 'max', 'mean', 'median', 'std']).to_dict()
+        
+        # Identify potential outliers using IQR, in one NumPy pass over the numeric block
+        quartiles = num_df.quantile([0.25, 0.75]).to_numpy()
+        Q1, Q3 = quartiles[0], quartiles[1]
+        IQR = Q3 - Q1
+        num_arr = num_df.to_numpy(dtype=np.float64, na_value=np.nan)
+        outlier_counts = dict(zip(numeric_columns, ((num_arr < Q1 - 1.5 * IQR) | (num_arr > Q3 + 1.5 * IQR)).sum(axis=0)))
+        # Only columns with more than 10 non-null values are checked for outliers
+        has_enough_values = num_df.count() > 10
+    
     for column in df.columns:
         col_type = str(df[column].dtype)
         
         # Basic column info
         column_data = {
             'dtype': col_type,
-            'missing_values': df[column].isnull().sum(),
-            'unique_values': df[column].nunique(),
+            'missing_values': missing_values[column],
+            'unique_values': len(string_uniques[column]) if column in string_uniques else int(nunique[column]),
         }
         
         # Add type-specific statistics
-        if np.issubdtype(df[column].dtype, np.number):
-            column_data.update({
-                'min': float(df[column].min()) if not pd.isna(df[column].min()) else None,
-                'max': float(df[column].max()) if not pd.isna(df[column].max()) else None,
-                'mean': float(df[column].mean()) if not pd.isna(df[column].mean()) else None,
-                'median': float(df[column].median()) if not pd.isna(df[column].median()) else None,
-                'std': float(df[column].std()) if not pd.isna(df[column].std()) else None,
-            })
-            
-            # Identify potential outliers using IQR
-            if not df[column].isnull().all() and len(df[column].dropna()) > 10:
-                Q1 = df[column].quantile(0.25)
-                Q3 = df[column].quantile(0.75)
-                IQR = Q3 - Q1
-                outliers = ((df[column] < (Q1 - 1.5 * IQR)) | (df[column] > (Q3 + 1.5 * IQR))).sum()
-                column_data['potential_outliers'] = int(outliers)
+        if column in is_numeric:
+            for stat, value in stats[column].items():
+                column_data[stat] = float(value) if not pd.isna(value) else None
+            
+            if has_enough_values[column]:
+                outliers = int(outlier_counts[column])
+                column_data['potential_outliers'] = outliers
                 column_data['potential_outliers_percent'] = float(outliers / len(df))
             else:
                 column_data['potential_outliers'] = 0
                 column_data['potential_outliers_percent'] = 0.0
         
-        elif df[column].dtype == 'object' or df[column].dtype == 'string':
-            # For string columns
-            sample_values = df[column].dropna().sample(min(5, df[column].nunique())).tolist() if df[column].nunique() > 0 else []
-            column_data['sample_values'] = sample_values
+        elif column in string_uniques:
+            # For string columns: the first distinct values
+            column_data['sample_values'] = string_uniques[column][:5].tolist()
             
             # Check if string column might be categorical
-            if df[column].nunique() <= min(10, len(df) * 0.05):
+            if column in string_categories:
                 column_data['might_be_categorical'] = True
-                column_data['categories'] = df[column].value_counts().to_dict()
+                column_data['categories'] = string_categories[column]
             else:
                 column_data['might_be_categorical'] = False
         
@@ -106,18 +256,61 @@ def detect_ecommerce_domain(df: pd.DataFrame) -> bool:
     """
     Detect if the dataset is likely from e-commerce domain
     """
-    # Lowercase column names for easier matching
-    columns = [col.lower() for col in df.columns]
+    # Only the column names matter, so the answer is memoized on them
+    return _is_ecommerce_schema(tuple(df.columns))
+
+# Column name keywords, each group matched as one alternation against the lowercased name
+_ECOMMERCE_RE = re.compile(
+    'product|price|discount|sale|order|customer|item|quantity|purchase|cart|'
+    'shipping|inventory|category|sku|transaction|payment|revenue|review'
+)
+_PRICE_RE = re.compile('price|cost|revenue')
+_QUANTITY_RE = re.compile('quantity|stock|inventory')
+_DATE_RE = re.compile('date|time')
+_ID_RE = re.compile('id|code|sku')
+
+# Names of typically positive quantities, and the identifier, person and contact
+# patterns used to score columns for duplicate detection
+_POSITIVE_RE = re.compile('price|cost|amount|quantity|stock|age|height|weight')
+_IDENTIFIER_RE = re.compile('id|code|key|num|number')
+_PERSON_RE = re.compile('name|user|customer|client|person')
+_CONTACT_RE = re.compile('email|mail|phone|contact')
+
+# AI duplicate detection is only worth a round-trip on frames at least this large
+_LLM_DUPLICATES_MIN_ROWS = 1000
+_LLM_DUPLICATES_MIN_COLUMNS = 8
+
+@lru_cache(maxsize=128)
+def _suggest_duplicate_columns(openai_api_key: str, column_info: str) -> str:
+    """Ask the LLM which columns identify duplicate records, memoized on the column description"""
+    prompt_text = f"""
+    You are an expert data scientist analyzing a dataset to find the best columns for identifying duplicate records.
+    Here are the columns in the dataset with their data types and uniqueness ratio (number of unique values / total rows):
+    
+    {column_info}
     
-    # Common e-commerce related column names
-    ecommerce_keywords = [
-        'product', 'price', 'discount', 'sale', 'order', 'customer',
-        'item', 'quantity', 'purchase', 'cart', 'shipping', 'inventory',
-        'category', 'sku', 'transaction', 'payment', 'revenue', 'review'
-    ]
+    Based on this information, identify which columns should be used together to detect duplicate records.
+    Focus on columns that might represent unique identifiers, names, emails, or other fields that would be the same when a record is duplicated.
     
+    Return your answer as a comma-separated list of column names, for example: "customer_id, email_address"
+    If no columns are suitable, respond with "all_columns".
+    ONLY return the comma-separated list, no explanations.
+    """
+    response = _get_llm(openai_api_key).invoke([HumanMessage(content=prompt_text)])
+    return response.content.strip()
+
+# Column kinds in the order apply_ecommerce_rules gives them precedence
+_COLUMN_KIND_RES = (('price', _PRICE_RE), ('quantity', _QUANTITY_RE), ('date', _DATE_RE), ('id', _ID_RE))
+
+def _ecommerce_column_kind(column: str) -> Optional[str]:
+    """The first e-commerce kind whose keywords appear in the column name, if any"""
+    lower = column.lower()
+    return next((kind for kind, pattern in _COLUMN_KIND_RES if pattern.search(lower)), None)
+
+@lru_cache(maxsize=64)
+def _is_ecommerce_schema(column_names: Tuple) -> bool:
     # Count number of ecommerce-related columns
-    ecommerce_column_count = sum(1 for col in columns if any(keyword in col for keyword in ecommerce_keywords))
+    ecommerce_column_count = sum(1 for col in column_names if _ECOMMERCE_RE.search(col.lower()))
     
     # If at least 3 columns match ecommerce keywords, consider it an ecommerce dataset
     return ecommerce_column_count >= 3
@@ -126,20 +319,18 @@ def apply_ecommerce_rules(df: pd.DataFrame, recommendations: DatasetRecommendati
     """
     Apply e-commerce specific cleaning rules to the recommendations
     """
-    # Identify e-commerce specific columns
-    price_columns = [col for col in df.columns if 'price' in col.lower() or 'cost' in col.lower() or 'revenue' in col.lower()]
-    quantity_columns = [col for col in df.columns if 'quantity' in col.lower() or 'stock' in col.lower() or 'inventory' in col.lower()]
-    date_columns = [col for col in df.columns if 'date' in col.lower() or 'time' in col.lower()]
-    id_columns = [col for col in df.columns if 'id' in col.lower() or 'code' in col.lower() or 'sku' in col.lower()]
+    # Identify e-commerce specific columns in a single pass over the names
+    column_kinds = {col: _ecommerce_column_kind(col) for col in df.columns}
     
     # Enhance recommendations for each column type
     updated_column_recommendations = []
     
     for rec in recommendations.column_recommendations:
         column = rec.column_name
+        kind = column_kinds.get(column)
         
         # Price columns should be positive numbers
-        if column in price_columns:
+        if kind == 'price':
             # Enhance missing value handling for price columns
             rec.missing_values = {
                 "method": "median",
@@ -164,7 +355,7 @@ def apply_ecommerce_rules(df: pd.DataFrame, recommendations: DatasetRecommendati
             ]
             
         # Quantity columns should be non-negative integers
-        elif column in quantity_columns:
+        elif kind == 'quantity':
             # Quantity columns typically use mode for missing values
             rec.missing_values = {
                 "method": "mode",
@@ -187,7 +378,7 @@ def apply_ecommerce_rules(df: pd.DataFrame, recommendations: DatasetRecommendati
             ]
             
         # Date columns need format standardization
-        elif column in date_columns:
+        elif kind == 'date':
             rec.missing_values = {
                 "method": "drop",
                 "reason": "Transactions without dates lack critical context and should typically be removed."
@@ -210,7 +401,7 @@ def apply_ecommerce_rules(df: pd.DataFrame, recommendations: DatasetRecommendati
             ]
             
         # ID columns should be unique and non-missing
-        elif column in id_columns:
+        elif kind == 'id':
             rec.missing_values = {
                 "method": "drop",
                 "reason": "Records without IDs cannot be uniquely identified and should be removed for data integrity."
@@ -245,118 +436,124 @@ def apply_ecommerce_rules(df: pd.DataFrame, recommendations: DatasetRecommendati
 
 def get_ai_cleaning_recommendations(df: pd.DataFrame) -> DatasetRecommendation:
     """
-    Use LLM to generate cleaning recommendations for the dataset
+    Use LLM to generate cleaning recommendations for the dataset,
+    falling back to the default recommendations if that fails
     """
     try:
-        # Check OpenAI API key
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key or openai_api_key == "empty-string":
-            logger.warning("OpenAI API key not configured, using default recommendations")
-            return create_default_recommendations(df)
-            
-        # If dataset is too large, sample it
-        sample_df = df if len(df) < 1000 else df.sample(1000, random_state=42)
+        return request_ai_cleaning_recommendations(df)
+    except Exception as e:
+        logger.error(f"Error getting AI recommendations: {str(e)}")
+        # Return default recommendations in case of error
+        return create_default_recommendations(df)
+
+def request_ai_cleaning_recommendations(df: pd.DataFrame) -> DatasetRecommendation:
+    """
+    Use LLM to generate cleaning recommendations for the dataset
+    
+    Raises if the OpenAI API key is not configured or the request fails.
+    """
+    # Check OpenAI API key
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    if not openai_api_key or openai_api_key == "empty-string":
+        raise ValueError("OpenAI API key not configured")
         
-        # Convert any potential problematic numeric types to Python native types
+    # Null counts for every column from one pass over the frame
+    missing_counts = df.isnull().sum()
+    
+    # Numeric stats as frame-level reductions; orjson writes the NumPy scalars
+    # directly and NaN as null. Four decimals are plenty for the model and keep
+    # the prompt short.
+    numeric_df = df.select_dtypes(include=np.number)
+    numeric_stats = {
+        'min': numeric_df.min().round(4),
+        'max': numeric_df.max().round(4),
+        'mean': numeric_df.mean().round(4),
+        'median': numeric_df.median().round(4),
+    }
+    
+    # Columnar description: one list per field, aligned with column_names, so the
+    # field names appear once per prompt rather than once per column
+    columns = df.columns.tolist()
+    is_numeric = set(numeric_df.columns)
+    column_fields = {
+        'dtype': [str(dtype) for dtype in df.dtypes],
+        'missing_values': missing_counts.tolist(),
+        'unique_values': df.nunique().tolist(),
+    }
+    for stat, values in numeric_stats.items():
+        column_fields[stat] = [values[col] if col in is_numeric else None for col in columns]
+    
+    # Wide datasets are described in column batches, each sent as its own prompt
+    payloads = []
+    for start in range(0, max(len(columns), 1), _PROMPT_COLUMN_BATCH):
+        stop = start + _PROMPT_COLUMN_BATCH
         sample_info = {
-            'rows': int(len(df)),
-            'columns': int(len(df.columns)),
-            'column_names': df.columns.tolist(),
-            'sample_data': []
+            'rows': len(df),
+            'columns': len(df.columns),
+            'column_names': columns[start:stop],
         }
-        
-        # Handle different column types appropriately
-        for col in df.columns:
-            col_info = {
-                'name': col,
-                'dtype': str(df[col].dtype),
-                'missing_values': int(df[col].isnull().sum()),
-                'unique_values': int(df[col].nunique())
-            }
-            
-            # Add numeric stats if applicable
-            if np.issubdtype(df[col].dtype, np.number):
-                col_info.update({
-                    'min': float(df[col].min()) if not pd.isna(df[col].min()) else None,
-                    'max': float(df[col].max()) if not pd.isna(df[col].max()) else None,
-                    'mean': float(df[col].mean()) if not pd.isna(df[col].mean()) else None,
-                    'median': float(df[col].median()) if not pd.isna(df[col].median()) else None
-                })
-            
-            sample_info['sample_data'].append(col_info)
-        
-        # Define the prompt template for recommendations
-        template = """
-        You are an expert data scientist providing recommendations for cleaning a dataset.
-        
-        Here's the analysis of the dataset:
-        {analysis}
-        """
-        
-        # Add domain-specific context if detected
-        if detect_ecommerce_domain(df):
-            template += """
-            This appears to be an e-commerce dataset. When making recommendations, consider:
-            1. Price columns should be positive and may need special outlier handling
-            2. Quantity/inventory columns should be non-negative integers
-            3. Order/transaction dates should be standardized
-            4. Product IDs and SKUs should be unique and well-formatted
-            5. Customer IDs typically should not have missing values
-            6. Duplicate order entries may indicate data issues
-            """
-        
-        template += """
-        Based on this analysis, provide detailed recommendations for cleaning this dataset.
-        Focus on handling missing values, outliers, and whether duplicates should be removed.
-        For each column, suggest the best approach based on the data characteristics.
-        
-        {format_instructions}
-        """
-        
-        # Setup OpenAI client
-        llm = ChatOpenAI(
-            model="gpt-3.5-turbo-0125",
-            temperature=0,
-            api_key=openai_api_key
-        )
-        
-        # Setup output parser BEFORE using it in the prompt
-        parser = PydanticOutputParser(pydantic_object=DatasetRecommendation)
-        
-        prompt = PromptTemplate(
-            template=template,
-            input_variables=["analysis"],
-            partial_variables={"format_instructions": parser.get_format_instructions()}
+        sample_info.update({field: values[start:stop] for field, values in column_fields.items()})
+        payloads.append(orjson.dumps(sample_info, option=orjson.OPT_SERIALIZE_NUMPY).decode())
+    
+    # Add domain-specific context if detected
+    is_ecommerce = detect_ecommerce_domain(df)
+    prompt = _recommendation_prompt(is_ecommerce)
+    
+    # Shared OpenAI client, asked for a bare JSON object that validates straight into the model
+    llm = _get_llm(openai_api_key).bind(response_format={"type": "json_object"})
+    
+    # Ask the model directly, running the batches' round-trips concurrently
+    def ask(payload: str) -> str:
+        return llm.invoke([HumanMessage(content=prompt.format(analysis=payload))]).content
+    
+    if len(payloads) == 1:
+        results = [ask(payloads[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(len(payloads), _PROMPT_MAX_CONCURRENCY)) as executor:
+            results = list(executor.map(ask, payloads))
+    
+    # Parse the output, merging the batches' recommendations
+    batch_recommendations = [DatasetRecommendation.model_validate_json(result.strip()) for result in results]
+    recommendations = batch_recommendations[0]
+    if len(batch_recommendations) > 1:
+        recommendations = DatasetRecommendation(
+            duplicate_removal=any(rec.duplicate_removal for rec in batch_recommendations),
+            column_recommendations=[
+                column_rec for rec in batch_recommendations for column_rec in rec.column_recommendations
+            ],
+            overall_advice="\n\n".join(rec.overall_advice for rec in batch_recommendations)
         )
+    
+    # Apply domain-specific rules if e-commerce dataset detected
+    if is_ecommerce:
+        recommendations = apply_ecommerce_rules(df, recommendations)
+    recommendations._is_ecommerce = is_ecommerce
         
-        # Execute chain
-        chain = LLMChain(llm=llm, prompt=prompt)
-        result = chain.run(analysis=json.dumps(sample_info, indent=2))
-        
-        # Parse the output
-        recommendations = parser.parse(result)
-        
-        # Apply domain-specific rules if e-commerce dataset detected
-        if detect_ecommerce_domain(df):
-            recommendations = apply_ecommerce_rules(df, recommendations)
-            
-        return recommendations
-        
-    except Exception as e:
-        logger.error(f"Error getting AI recommendations: {str(e)}")
-        # Return default recommendations in case of error
-        return create_default_recommendations(df)
+    return recommendations
 
 def create_default_recommendations(df: pd.DataFrame) -> DatasetRecommendation:
     """Create default cleaning recommendations based on data characteristics"""
     column_recs = []
+    missing_counts = df.isnull().sum()
+    
+    # Numeric column statistics and Z-score outlier counts, from one pass over the numeric block
+    numeric_columns = [column for column in df.columns if np.issubdtype(df[column].dtype, np.number)]
+    is_numeric = set(numeric_columns)
+    if numeric_columns:
+        num_df = df[numeric_columns]
+        agg = num_df.agg(['count', 'mean', 'std', 'min'])
+        stats = agg.to_dict()
+        num_arr = num_df.to_numpy(dtype=np.float64, na_value=np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z_scores = np.abs((num_arr - agg.loc['mean'].to_numpy(dtype=np.float64)) / agg.loc['std'].to_numpy(dtype=np.float64))
+        zscore_outliers = dict(zip(numeric_columns, (z_scores > 3).sum(axis=0)))
     
     for column in df.columns:
         # Get column data type
         data_type = str(df[column].dtype)
         
         # Check if column has missing values
-        missing_count = df[column].isnull().sum()
+        missing_count = missing_counts[column]
         has_missing = missing_count > 0
         
         # Default strategy - will be updated based on data type
@@ -367,7 +564,7 @@ def create_default_recommendations(df: pd.DataFrame) -> DatasetRecommendation:
         
         # Choose appropriate missing value strategy based on data type
         if has_missing:
-            if np.issubdtype(df[column].dtype, np.number):
+            if column in is_numeric:
                 # For numeric columns, use median (more robust than mean)
                 missing_values_strategy = {
                     "method": "median",
@@ -387,12 +584,10 @@ def create_default_recommendations(df: pd.DataFrame) -> DatasetRecommendation:
             "reason": "Non-numeric column, no outlier detection needed"
         }
         
-        if np.issubdtype(df[column].dtype, np.number) and len(df[column].dropna()) > 5:
+        if column in is_numeric and stats[column]['count'] > 5:
             # Detect outliers with Z-score
-            if df[column].std() > 0:  # Ensure non-zero standard deviation
-                z_scores = np.abs((df[column] - df[column].mean()) / df[column].std())
-                outliers = z_scores > 3
-                outlier_count = outliers.sum()
+            if stats[column]['std'] > 0:  # Ensure non-zero standard deviation
+                outlier_count = zscore_outliers[column]
                 
                 if outlier_count > 0:
                     outliers_strategy = {
@@ -405,11 +600,9 @@ def create_default_recommendations(df: pd.DataFrame) -> DatasetRecommendation:
         value_transformations = []
         
         # Check for negative values in columns that should be positive
-        if np.issubdtype(df[column].dtype, np.number) and df[column].min() < 0:
+        if column in is_numeric and stats[column]['min'] < 0:
             # Check if column might represent price, quantity, or other typically positive value
-            col_lower = column.lower()
-            is_typically_positive = any(kw in col_lower for kw in 
-                                         ['price', 'cost', 'amount', 'quantity', 'stock', 'age', 'height', 'weight'])
+            is_typically_positive = bool(_POSITIVE_RE.search(column.lower()))
             
             if is_typically_positive:
                 value_transformations.append("Ensure all values are positive")
@@ -427,24 +620,71 @@ def create_default_recommendations(df: pd.DataFrame) -> DatasetRecommendation:
         
         column_recs.append(column_rec)
     
-    # Check for duplicates
-    duplicate_count = len(df) - len(df.drop_duplicates())
+    # Check for duplicates; only whether there are any matters here
+    has_duplicates = bool(df.duplicated().any())
     
     # Create dataset recommendation
     dataset_rec = DatasetRecommendation(
-        duplicate_removal=duplicate_count > 0,
+        duplicate_removal=has_duplicates,
         column_recommendations=column_recs,
         overall_advice="Automatic cleaning recommendations based on data analysis. Missing values are handled using median for numeric columns and mode for categorical columns. Outliers are detected with Z-score and capped to maintain data integrity."
     )
     
     return dataset_rec
 
+def _outlier_mask(values: pd.Series, method: str, stats: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, float, float]:
+    """
+    Flag outliers of a numeric column on its raw float64 values
+    
+    Returns the boolean mask together with the (lower, upper) bounds it was
+    built from, so capping can reuse them instead of recomputing the statistics.
+    stats may carry the column's analyze_dataframe entry when the values are
+    unchanged since the analysis, so the z-score mean and std are not recomputed.
+    """
+    arr = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if method == 'zscore':
+            if stats is not None and stats.get('std') is not None:
+                mean, std = stats['mean'], stats['std']
+                # If the analyzed extremes are within 3 std devs, so is every value
+                if std > 0 and abs(stats['max'] - mean) / std <= 3 and abs(stats['min'] - mean) / std <= 3:
+                    return np.zeros(len(arr), dtype=bool), mean - 3 * std, mean + 3 * std
+            else:
+                mean, std = values.mean(), values.std()
+            mask = np.abs(arr - mean) / std > 3
+            return mask, mean - 3 * std, mean + 3 * std
+        
+        # IQR method
+        Q1, Q3 = values.quantile([0.25, 0.75])
+        IQR = Q3 - Q1
+        lower_bound, upper_bound = Q1 - 1.5 * IQR, Q3 + 1.5 * IQR
+        mask = (arr < lower_bound) | (arr > upper_bound)
+        return mask, lower_bound, upper_bound
+
 def apply_ai_recommendations(df: pd.DataFrame, recommendations: DatasetRecommendation) -> Tuple[pd.DataFrame, Dict[str, Any]]:
     """
     Apply the AI-generated recommendations to clean the dataset
     """
-    # Create a copy of the dataframe
-    cleaned_df = df.copy()
+    # Shallow copy of the dataframe; with copy-on-write untouched columns are never duplicated
+    cleaned_df = df.copy(deep=False)
+    
+    # Statistics of the source frame if it was already analyzed; they stay valid for a
+    # column until it is written to or rows are dropped
+    source_stats = cached_column_stats(df)
+    changed_columns = set()
+    
+    # Columns to fill with their most common value; their modes are taken together on first use
+    mode_columns = list(dict.fromkeys(
+        rec.column_name for rec in recommendations.column_recommendations
+        if rec.missing_values.get('method') == 'mode' and rec.column_name in cleaned_df.columns
+    ))
+    first_modes, modes_rows = None, None
+    
+    # Cleaning never changes whether a column is numeric, so the check is made once up front
+    numeric_columns = {column for column in cleaned_df.columns if np.issubdtype(cleaned_df[column].dtype, np.number)}
+    
+    # Null counts of the source frame; a column's count stays valid until it is written to or rows are dropped
+    missing_counts = missing_value_counts(df)
     
     # Initialize audit log
     audit_log = []
@@ -453,12 +693,12 @@ def apply_ai_recommendations(df: pd.DataFrame, recommendations: DatasetRecommend
     report = {
         'original_rows': len(df),
         'original_columns': len(df.columns),
-        'missing_values_before': df.isnull().sum().to_dict(),
+        'missing_values_before': missing_counts.to_dict(),
         'duplicates_removed': 0,
         'outliers_handled': {},
         'missing_values_handled': {},
-        'ai_recommendations': recommendations.dict(),
-        'is_ecommerce_dataset': detect_ecommerce_domain(df),
+        'ai_recommendations': recommendations.model_dump(),
+        'is_ecommerce_dataset': recommendations._is_ecommerce if recommendations._is_ecommerce is not None else detect_ecommerce_domain(df),
         'audit_log': audit_log
     }
     
@@ -466,118 +706,69 @@ def apply_ai_recommendations(df: pd.DataFrame, recommendations: DatasetRecommend
     if recommendations.duplicate_removal:
         duplicates_before = len(cleaned_df)
         
+        # Share of distinct values per column, from one frame-level pass
+        uniqueness = cleaned_df.nunique() / len(cleaned_df) if len(cleaned_df) > 0 else pd.Series(0.0, index=cleaned_df.columns)
+        
         try:
             # Try to use LangChain for intelligent duplicate identification
             openai_api_key = os.getenv("OPENAI_API_KEY")
-            if openai_api_key and openai_api_key != "empty-string":
-                # Initialize the LLM
-                llm = ChatOpenAI(
-                    model="gpt-3.5-turbo-0125",
-                    temperature=0,
-                    api_key=openai_api_key
-                )
-                
-                # Create a sample of the dataframe for analysis
-                sample_size = min(10, len(cleaned_df))
-                df_sample = cleaned_df.sample(sample_size) if sample_size > 0 else cleaned_df
-                
-                # Create a description of the dataframe
-                column_descriptions = []
-                for col in cleaned_df.columns:
-                    col_type = str(cleaned_df[col].dtype)
-                    unique_ratio = cleaned_df[col].nunique() / len(cleaned_df) if len(cleaned_df) > 0 else 0
-                    column_descriptions.append(f"- {col} (type: {col_type}, uniqueness: {unique_ratio:.2f})")
-                    
-                column_info = "\n".join(column_descriptions)
-                    
-                # Create the prompt for the LLM
-                prompt_text = f"""
-                You are an expert data scientist analyzing a dataset to find the best columns for identifying duplicate records.
-                Here are the columns in the dataset with their data types and uniqueness ratio (number of unique values / total rows):
-                
-                {column_info}
-                
-                Based on this information, identify which columns should be used together to detect duplicate records.
-                Focus on columns that might represent unique identifiers, names, emails, or other fields that would be the same when a record is duplicated.
-                
-                Return your answer as a comma-separated list of column names, for example: "customer_id, email_address"
-                If no columns are suitable, respond with "all_columns".
-                ONLY return the comma-separated list, no explanations.
-                """
-                
-                # Get the LLM's response
-                response = llm.invoke([HumanMessage(content=prompt_text)])
-                response_text = response.content.strip()
-                
-                # Parse the response to get the columns
-                if response_text.lower() == "all_columns":
-                    duplicate_subset = None  # Use all columns
-                    used_columns = ["all columns"]
-                else:
-                    # Split by comma and strip whitespace
-                    suggested_columns = [col.strip() for col in response_text.split(',')]
-                    # Filter to only include columns that exist in the dataframe
-                    duplicate_subset = [col for col in suggested_columns if col in cleaned_df.columns]
-                    used_columns = duplicate_subset if duplicate_subset else ["all columns"]
-                
-                # Log what the AI suggested
-                logger.info(f"AI suggested using these columns for duplicate detection: {response_text}")
-                
-                # If the AI didn't find suitable columns, fall back to the scoring method
-                if not duplicate_subset:
-                    logger.info("Falling back to scoring method for duplicate detection")
-                    raise Exception("LLM didn't return usable column names")
-            else:
+            if not openai_api_key or openai_api_key == "empty-string":
                 # No API key, fall back to the scoring method
                 raise Exception("OpenAI API key not configured or invalid")
+            if len(cleaned_df) < _LLM_DUPLICATES_MIN_ROWS or len(cleaned_df.columns) < _LLM_DUPLICATES_MIN_COLUMNS:
+                # Small frames are handled well by the scoring method, without a round-trip
+                raise Exception("Dataset too small to need AI duplicate detection")
+            
+            # Create a description of the dataframe
+            column_info = "\n".join(
+                f"- {col} (type: {dtype}, uniqueness: {ratio:.2f})"
+                for col, dtype, ratio in zip(cleaned_df.columns, cleaned_df.dtypes, uniqueness)
+            )
+            
+            # Get the LLM's response, memoized on the description
+            response_text = _suggest_duplicate_columns(openai_api_key, column_info)
+            
+            # Parse the response to get the columns
+            if response_text.lower() == "all_columns":
+                duplicate_subset = None  # Use all columns
+                used_columns = ["all columns"]
+            else:
+                # Split by comma and strip whitespace
+                suggested_columns = [col.strip() for col in response_text.split(',')]
+                # Filter to only include columns that exist in the dataframe
+                duplicate_subset = [col for col in suggested_columns if col in cleaned_df.columns]
+                used_columns = duplicate_subset if duplicate_subset else ["all columns"]
+            
+            # Log what the AI suggested
+            logger.info(f"AI suggested using these columns for duplicate detection: {response_text}")
+            
+            # If the AI didn't find suitable columns, fall back to the scoring method
+            if not duplicate_subset:
+                logger.info("Falling back to scoring method for duplicate detection")
+                raise Exception("LLM didn't return usable column names")
                 
         except Exception as e:
             logger.warning(f"Error using LLM for duplicate detection: {str(e)}. Falling back to manual scoring.")
             
             # Fall back to the scoring-based method (retain this as a backup)
-            potential_id_columns = []
-            
-            # Step 1: Analyze each column for uniqueness and naming patterns
-            for col in cleaned_df.columns:
-                col_lower = col.lower()
-                uniqueness_ratio = cleaned_df[col].nunique() / len(cleaned_df) if len(cleaned_df) > 0 else 0
-                
-                # High uniqueness suggests an identifier (but not 100% unique)
-                is_likely_identifier = 0.5 < uniqueness_ratio < 1.0
-                
-                # Common identifier patterns in column names
-                common_id_patterns = ['id', 'code', 'key', 'num', 'number']
-                name_patterns = ['name', 'user', 'customer', 'client', 'person']
-                contact_patterns = ['email', 'mail', 'phone', 'contact']
-                
-                # Score the column based on name and uniqueness
-                score = 0
-                
+            # Step 1: Score every column on its name patterns and uniqueness at once
+            lower_names = [col.lower() for col in cleaned_df.columns]
+            ratios = uniqueness.to_numpy(dtype=np.float64)
+            scores = (
                 # Column appears to be an ID field by name
-                if any(pattern in col_lower for pattern in common_id_patterns):
-                    score += 5
-                
+                5 * np.array([bool(_IDENTIFIER_RE.search(name)) for name in lower_names], dtype=np.int64)
                 # Column appears to be a name field
-                if any(pattern in col_lower for pattern in name_patterns):
-                    score += 3
-                
+                + 3 * np.array([bool(_PERSON_RE.search(name)) for name in lower_names], dtype=np.int64)
                 # Column appears to be a contact field
-                if any(pattern in col_lower for pattern in contact_patterns):
-                    score += 4
-                    
-                # Has good uniqueness but not perfect (perfect might be primary key)
-                if is_likely_identifier:
-                    score += 3
-                elif uniqueness_ratio == 1.0:  # Perfect uniqueness - likely primary key
-                    score += 6
-                elif uniqueness_ratio > 0.8:   # Very high uniqueness
-                    score += 4
-                
-                if score > 0:
-                    potential_id_columns.append((col, score))
+                + 4 * np.array([bool(_CONTACT_RE.search(name)) for name in lower_names], dtype=np.int64)
+                # Good uniqueness but not perfect suggests an identifier; perfect uniqueness
+                # a primary key; otherwise very high uniqueness still counts
+                + np.select([(ratios > 0.5) & (ratios < 1.0), ratios == 1.0, ratios > 0.8], [3, 6, 4], default=0)
+            )
             
-            # Sort columns by score in descending order
-            potential_id_columns.sort(key=lambda x: x[1], reverse=True)
+            # Columns with a positive score, highest first (ties keep column order)
+            order = np.argsort(-scores, kind='stable')
+            potential_id_columns = [(cleaned_df.columns[i], int(scores[i])) for i in order if scores[i] > 0]
             
             # Step 2: Decide on which columns to use for duplicate detection
             duplicate_subset = None
@@ -597,10 +788,10 @@ def apply_ai_recommendations(df: pd.DataFrame, recommendations: DatasetRecommend
         
         # Drop duplicates based on chosen subset
         if duplicate_subset:
-            cleaned_df = cleaned_df.drop_duplicates(subset=duplicate_subset, keep='first')
+            cleaned_df = cleaned_df.drop_duplicates(subset=duplicate_subset, keep='first', ignore_index=True)
         else:
             # Fall back to all columns if no clear identifiers found
-            cleaned_df = cleaned_df.drop_duplicates(keep='first')
+            cleaned_df = cleaned_df.drop_duplicates(keep='first', ignore_index=True)
             used_columns = ["all columns"]
         
         duplicates_removed = duplicates_before - len(cleaned_df)
@@ -608,8 +799,7 @@ def apply_ai_recommendations(df: pd.DataFrame, recommendations: DatasetRecommend
         
         # Log duplicate removal in audit log
         audit_log.append(
-            DataAuditLog(
-                timestamp=datetime.now().isoformat(),
+            _audit_entry(
                 operation="remove_duplicates",
                 column=None,
                 details={
@@ -618,7 +808,7 @@ def apply_ai_recommendations(df: pd.DataFrame, recommendations: DatasetRecommend
                     "duplicates_found": duplicates_removed
                 },
                 rows_affected=duplicates_removed
-            ).dict()
+            )
         )
     
     # Apply column-specific recommendations
@@ -632,7 +822,10 @@ def apply_ai_recommendations(df: pd.DataFrame, recommendations: DatasetRecommend
         # Handle missing values
         missing_method = column_rec.missing_values.get('method', 'none')
         if missing_method != 'none':
-            missing_before = cleaned_df[column].isnull().sum()
+            if column not in changed_columns and len(cleaned_df) == len(df):
+                missing_before = int(missing_counts[column])
+            else:
+                missing_before = int(cleaned_df[column].isnull().sum())
             
             if missing_method == 'drop':
                 rows_before = len(cleaned_df)
@@ -641,23 +834,22 @@ def apply_ai_recommendations(df: pd.DataFrame, recommendations: DatasetRecommend
                 
                 # Log in audit
                 audit_log.append(
-                    DataAuditLog(
-                        timestamp=datetime.now().isoformat(),
+                    _audit_entry(
                         operation="drop_missing_values",
                         column=column,
                         details={"method": missing_method, "reason": column_rec.missing_values.get('reason', '')},
                         rows_affected=rows_affected
-                    ).dict()
+                    )
                 )
                 
-            elif missing_method == 'mean' and np.issubdtype(cleaned_df[column].dtype, np.number):
+            elif missing_method == 'mean' and column in numeric_columns:
                 mean_value = cleaned_df[column].mean()
-                cleaned_df[column] = cleaned_df[column].fillna(mean_value)
+                if missing_before > 0:
+                    cleaned_df[column] = cleaned_df[column].fillna(mean_value)
                 
                 # Log in audit
                 audit_log.append(
-                    DataAuditLog(
-                        timestamp=datetime.now().isoformat(),
+                    _audit_entry(
                         operation="fill_missing_values",
                         column=column,
                         details={
@@ -666,17 +858,17 @@ def apply_ai_recommendations(df: pd.DataFrame, recommendations: DatasetRecommend
                             "reason": column_rec.missing_values.get('reason', '')
                         },
                         rows_affected=missing_before
-                    ).dict()
+                    )
                 )
                 
-            elif missing_method == 'median' and np.issubdtype(cleaned_df[column].dtype, np.number):
+            elif missing_method == 'median' and column in numeric_columns:
                 median_value = cleaned_df[column].median()
-                cleaned_df[column] = cleaned_df[column].fillna(median_value)
+                if missing_before > 0:
+                    cleaned_df[column] = cleaned_df[column].fillna(median_value)
                 
                 # Log in audit
                 audit_log.append(
-                    DataAuditLog(
-                        timestamp=datetime.now().isoformat(),
+                    _audit_entry(
                         operation="fill_missing_values",
                         column=column,
                         details={
@@ -685,21 +877,26 @@ def apply_ai_recommendations(df: pd.DataFrame, recommendations: DatasetRecommend
                             "reason": column_rec.missing_values.get('reason', '')
                         },
                         rows_affected=missing_before
-                    ).dict()
+                    )
                 )
                 
             elif missing_method == 'mode':
-                mode_value = cleaned_df[column].mode()[0] if not cleaned_df[column].mode().empty else None
-                if mode_value is not None:
-                    cleaned_df[column] = cleaned_df[column].fillna(mode_value)
+                # Dropped rows can change the modes, so they are retaken if the row count moved
+                if first_modes is None or modes_rows != len(cleaned_df):
+                    modes = cleaned_df[mode_columns].mode(dropna=True)
+                    first_modes = modes.iloc[0] if len(modes) else pd.Series(index=mode_columns, dtype=object)
+                    modes_rows = len(cleaned_df)
+                mode_value = first_modes[column]
+                if not pd.isna(mode_value):
+                    if missing_before > 0:
+                        cleaned_df[column] = cleaned_df[column].fillna(mode_value)
                     
                     # Convert mode_value to string for JSON serialization if it's not a number
                     mode_value_json = float(mode_value) if isinstance(mode_value, (int, float)) else str(mode_value)
                     
                     # Log in audit
                     audit_log.append(
-                        DataAuditLog(
-                            timestamp=datetime.now().isoformat(),
+                        _audit_entry(
                             operation="fill_missing_values",
                             column=column,
                             details={
@@ -708,26 +905,23 @@ def apply_ai_recommendations(df: pd.DataFrame, recommendations: DatasetRecommend
                                 "reason": column_rec.missing_values.get('reason', '')
                             },
                             rows_affected=missing_before
-                        ).dict()
+                        )
                     )
             
+            if missing_before > 0:
+                changed_columns.add(column)
             report['missing_values_handled'][column] = missing_method
         
         # Handle outliers for numeric columns
         outlier_method = column_rec.outliers.get('method', 'none')
         outlier_action = column_rec.outliers.get('action', 'none')
         
-        if outlier_method != 'none' and np.issubdtype(cleaned_df[column].dtype, np.number):
+        if outlier_method != 'none' and column in numeric_columns:
             # Detect outliers
-            if outlier_method == 'zscore':
-                z_scores = np.abs((cleaned_df[column] - cleaned_df[column].mean()) / cleaned_df[column].std())
-                outliers = z_scores > 3
-            else:  # IQR method
-                Q1 = cleaned_df[column].quantile(0.25)
-                Q3 = cleaned_df[column].quantile(0.75)
-                IQR = Q3 - Q1
-                outliers = (cleaned_df[column] < Q1 - 1.5 * IQR) | (cleaned_df[column] > Q3 + 1.5 * IQR)
-            
+            unchanged = column not in changed_columns and len(cleaned_df) == len(df)
+            outliers, lower_bound, upper_bound = _outlier_mask(
+                cleaned_df[column], outlier_method, source_stats.get(column) if unchanged else None
+            )
             outlier_count = int(outliers.sum())
             
             # Apply outlier handling
@@ -738,8 +932,7 @@ def apply_ai_recommendations(df: pd.DataFrame, recommendations: DatasetRecommend
                 
                 # Log in audit
                 audit_log.append(
-                    DataAuditLog(
-                        timestamp=datetime.now().isoformat(),
+                    _audit_entry(
                         operation="remove_outliers",
                         column=column,
                         details={
@@ -748,56 +941,38 @@ def apply_ai_recommendations(df: pd.DataFrame, recommendations: DatasetRecommend
                             "reason": column_rec.outliers.get('reason', '')
                         },
                         rows_affected=rows_removed
-                    ).dict()
+                    )
                 )
                 
             elif outlier_action == 'cap' and outlier_count > 0:
+                changed_columns.add(column)
                 if outlier_method == 'zscore':
-                    mean, std = cleaned_df[column].mean(), cleaned_df[column].std()
-                    
-                    # Store original values for audit
-                    original_values = cleaned_df.loc[outliers, column].copy()
-                    
-                    # Apply capping
-                    cleaned_df.loc[outliers, column] = cleaned_df.loc[outliers, column].apply(
-                        lambda x: mean + 3 * std if x > mean else mean - 3 * std
-                    )
+                    # Apply capping; values within 3 std devs are left as they are
+                    cleaned_df[column] = cleaned_df[column].clip(lower_bound, upper_bound)
                     
                     # Log in audit
                     audit_log.append(
-                        DataAuditLog(
-                            timestamp=datetime.now().isoformat(),
+                        _audit_entry(
                             operation="cap_outliers",
                             column=column,
                             details={
                                 "method": outlier_method, 
                                 "threshold": 3,
-                                "upper_cap": float(mean + 3 * std),
-                                "lower_cap": float(mean - 3 * std),
+                                "upper_cap": float(upper_bound),
+                                "lower_cap": float(lower_bound),
                                 "reason": column_rec.outliers.get('reason', '')
                             },
                             rows_affected=outlier_count
-                        ).dict()
+                        )
                     )
                     
-                else:  # IQR method
-                    Q1 = cleaned_df[column].quantile(0.25)
-                    Q3 = cleaned_df[column].quantile(0.75)
-                    IQR = Q3 - Q1
-                    lower_bound = Q1 - 1.5 * IQR
-                    upper_bound = Q3 + 1.5 * IQR
-                    
-                    # Store original values for audit
-                    original_values = cleaned_df.loc[outliers, column].copy()
-                    
+                else:  # IQR method, reusing the bounds the outliers were detected with
                     # Apply capping
-                    cleaned_df.loc[cleaned_df[column] < lower_bound, column] = lower_bound
-                    cleaned_df.loc[cleaned_df[column] > upper_bound, column] = upper_bound
+                    cleaned_df[column] = cleaned_df[column].clip(lower_bound, upper_bound)
                     
                     # Log in audit
                     audit_log.append(
-                        DataAuditLog(
-                            timestamp=datetime.now().isoformat(),
+                        _audit_entry(
                             operation="cap_outliers",
                             column=column,
                             details={
@@ -808,7 +983,7 @@ def apply_ai_recommendations(df: pd.DataFrame, recommendations: DatasetRecommend
                                 "reason": column_rec.outliers.get('reason', '')
                             },
                             rows_affected=outlier_count
-                        ).dict()
+                        )
                     )
             
             report['outliers_handled'][column] = {
@@ -820,37 +995,40 @@ def apply_ai_recommendations(df: pd.DataFrame, recommendations: DatasetRecommend
         # Apply value transformations if they exist
         transformations = column_rec.value_transformations
         if transformations:
+            changed_columns.add(column)
             # E-commerce specific transformations
-            if "Ensure all prices are positive" in transformations and cleaned_df[column].min() < 0:
-                negative_count = (cleaned_df[column] < 0).sum()
-                cleaned_df.loc[cleaned_df[column] < 0, column] = 0
-                
-                # Log transformation
-                audit_log.append(
-                    DataAuditLog(
-                        timestamp=datetime.now().isoformat(),
-                        operation="value_transformation",
-                        column=column,
-                        details={"transformation": "ensure_positive_values"},
-                        rows_affected=negative_count
-                    ).dict()
-                )
+            if "Ensure all prices are positive" in transformations:
+                # The negative mask is built once and drives both the count and the write
+                negative = cleaned_df[column] < 0
+                negative_count = int(negative.sum())
+                if negative_count > 0:
+                    cleaned_df[column] = cleaned_df[column].mask(negative, 0)
+                    
+                    # Log transformation
+                    audit_log.append(
+                        _audit_entry(
+                            operation="value_transformation",
+                            column=column,
+                            details={"transformation": "ensure_positive_values"},
+                            rows_affected=negative_count
+                        )
+                    )
             
             # General transformations for typical positive values
             if "Ensure all values are positive" in transformations:
-                negative_count = (cleaned_df[column] < 0).sum()
+                negative_count = int((cleaned_df[column] < 0).sum())
                 if negative_count > 0:
-                    cleaned_df.loc[cleaned_df[column] < 0, column] = abs(cleaned_df.loc[cleaned_df[column] < 0, column])
+                    # abs() leaves the non-negative values as they are, so no masked write is needed
+                    cleaned_df[column] = cleaned_df[column].abs()
                     
                     # Log transformation
                     audit_log.append(
-                        DataAuditLog(
-                            timestamp=datetime.now().isoformat(),
+                        _audit_entry(
                             operation="value_transformation",
                             column=column,
                             details={"transformation": "convert_negative_to_positive"},
                             rows_affected=negative_count
-                        ).dict()
+                        )
                     )
                 
             if "Round to standard currency precision (2 decimal places)" in transformations:
@@ -858,37 +1036,39 @@ def apply_ai_recommendations(df: pd.DataFrame, recommendations: DatasetRecommend
                 
                 # Log transformation
                 audit_log.append(
-                    DataAuditLog(
-                        timestamp=datetime.now().isoformat(),
+                    _audit_entry(
                         operation="value_transformation",
                         column=column,
                         details={"transformation": "round_to_currency_precision", "decimal_places": 2},
                         rows_affected=len(cleaned_df)
-                    ).dict()
+                    )
                 )
                 
             if "Convert to integer values" in transformations:
                 try:
-                    non_integer_count = (~cleaned_df[column].apply(lambda x: float(x).is_integer())).sum()
+                    # Vectorized is_integer(); NaN and inf count as non-integer, as before
+                    values = cleaned_df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+                    with np.errstate(invalid='ignore'):
+                        non_integer_count = int(np.count_nonzero(np.mod(values, 1) != 0))
                     cleaned_df[column] = cleaned_df[column].fillna(0).astype(int)
                     
                     # Log transformation
                     audit_log.append(
-                        DataAuditLog(
-                            timestamp=datetime.now().isoformat(),
+                        _audit_entry(
                             operation="value_transformation",
                             column=column,
                             details={"transformation": "convert_to_integer"},
                             rows_affected=non_integer_count
-                        ).dict()
+                        )
                     )
                 except Exception as e:
                     logger.error(f"Error converting column {column} to integer: {str(e)}")
     
     # Final dataset stats
+    _format_audit_timestamps(audit_log)
     report['final_rows'] = len(cleaned_df)
     report['final_columns'] = len(cleaned_df.columns)
-    report['missing_values_after'] = cleaned_df.isnull().sum().to_dict()
+    report['missing_values_after'] = missing_value_counts(cleaned_df).to_dict()
     
     return cleaned_df, report
 
@@ -4,6 +4,7 @@ export interface DataInfo {
   column_names: string[];
   missing_values: { [key: string]: number };
   file_name: string;
+  analysis_job_id?: string;
   agent_analysis?: string;
   ai_recommendations?: any;
 }